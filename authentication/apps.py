@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class AuthenticationConfig(AppConfig):
     name = 'authentication'
+
+    def ready(self):
+        # Register signal handlers and system checks
+        import authentication.signals  # noqa: F401
+        import authentication.checks  # noqa: F401
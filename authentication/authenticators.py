@@ -1,16 +1,20 @@
 import datetime
 import jwt
 
+from authentication.caches import verified_token_cache, VerifiedToken
+from authentication.helper_functions import get_token_digest
 from authentication.models import JwtToken
+from authentication.users import TokenUser
 from profiles.models import User
-from django_api_base.settings import JWT_SECRET
+from django_api_base.settings import JWT_SECRET, JWT_TRUST_ROLE_CLAIMS
 from jwt import DecodeError, ExpiredSignatureError
 from rest_framework import authentication
 
 
 class JwtTokenAuthentication(authentication.BaseAuthentication):
     """
-    Custom authentication class to authenticate users with jwt token headers
+    Custom authentication class to authenticate users with jwt token headers.
+    Authenticated users are represented with TokenUser objects, loading the User object only when needed
     """
 
     def authenticate(self, request):
@@ -21,6 +25,14 @@ class JwtTokenAuthentication(authentication.BaseAuthentication):
             key, token = auth_header.split(' ')
 
             if key == 'Bearer':
+                digest = get_token_digest(token)
+
+                # Tokens verified recently skip signature, token and user checks
+                verified_token = verified_token_cache.get(digest)
+                if verified_token is not None:
+                    # Successfully authenticated
+                    return self._get_token_user(verified_token), None
+
                 # Try to decode jwt token here
                 try:
                     payload = jwt.decode(jwt=token, key=JWT_SECRET)
@@ -42,20 +54,19 @@ class JwtTokenAuthentication(authentication.BaseAuthentication):
                             raise InvalidTokenException()
                         else:
                             if expires_on > datetime.datetime.utcnow():
-                                try:
-                                    JwtToken.objects.get(token=token)
-                                except JwtToken.DoesNotExist:
+                                if not JwtToken.objects.filter(digest=digest).exists():
                                     # Invalid token or authenticated with a different device id
                                     raise InvalidTokenException()
                                 else:
-                                    try:
-                                        user = User.objects.get(username=username)
-                                    except User.DoesNotExist:
-                                        # Invalid username
+                                    verified_token = self._get_verified_token(payload)
+
+                                    if not self._user_exists(verified_token):
+                                        # Invalid user or roles changed after token was issued
                                         raise InvalidTokenException()
-                                    else:
-                                        # Successfully authenticated
-                                        return user, None
+
+                                    # Successfully authenticated
+                                    verified_token_cache.set(digest, verified_token, int(exp))
+                                    return self._get_token_user(verified_token), None
                             else:
                                 # Token expired
                                 raise InvalidTokenException()
@@ -66,3 +77,53 @@ class JwtTokenAuthentication(authentication.BaseAuthentication):
                 return None
 
         return None
+
+    @staticmethod
+    def _get_verified_token(payload):
+        """
+        :param payload: Decoded token payload
+        :return: VerifiedToken for the payload, with role claims if they are trusted and present in the payload
+        """
+        from common.exceptions import InvalidTokenException
+
+        user_id = payload.get('user_id', None)
+        username = payload.get('username')
+
+        if user_id is None:
+            # Token issued before user ids were added to the claims
+            try:
+                user_id = User.objects.values_list('id', flat=True).get(username=username)
+            except User.DoesNotExist:
+                # Invalid username
+                raise InvalidTokenException()
+
+        roles = payload.get('roles', None)
+        role_version = payload.get('role_version', None)
+
+        if JWT_TRUST_ROLE_CLAIMS and roles is not None and role_version is not None:
+            return VerifiedToken(user_id, username, frozenset(roles), role_version)
+
+        # Roles will be loaded from database
+        return VerifiedToken(user_id, username, None, None)
+
+    @staticmethod
+    def _user_exists(verified_token):
+        """
+        :param verified_token: VerifiedToken to check
+        :return: True if the user exists and, when role claims are used, roles of the user did not change
+        after the token was issued. False otherwise
+        """
+        users = User.objects.filter(pk=verified_token.user_id)
+
+        if verified_token.role_types is not None:
+            users = users.filter(role_version=verified_token.role_version)
+
+        return users.exists()
+
+    @staticmethod
+    def _get_token_user(verified_token):
+        """
+        :param verified_token: VerifiedToken the user will be built from
+        :return: TokenUser for the verified token
+        """
+        return TokenUser(verified_token.user_id, verified_token.username, verified_token.role_types)
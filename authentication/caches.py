@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.core.cache import caches
+
+from django_api_base.settings import JWT_TOKEN_CACHE_SIZE, JWT_TOKEN_CACHE_TIMEOUT, JWT_TOKEN_REVOCATION_CACHE
+
+# Data resolved from a verified token. role_types and role_version are None unless role claims are trusted
+VerifiedToken = namedtuple('VerifiedToken', ('user_id', 'username', 'role_types', 'role_version'))
+
+
+class VerifiedTokenCache:
+    """
+    Process local, size bounded LRU cache of verified tokens. Maps token digests to the data resolved from the token.
+    Entries never outlive the expiry of their token, nor the configured timeout.
+    Revoked tokens and users are marked in a shared cache, checked on each hit, so that revocations on one process
+    apply to entries cached on all processes
+    """
+
+    def __init__(self, max_size, timeout, revocation_cache):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.revocation_cache = revocation_cache
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        """
+        :param digest: Token digest
+        :return: VerifiedToken for the digest, None if not cached or expired
+        """
+        with self._lock:
+            try:
+                verified_token, valid_until = self._entries[digest]
+            except KeyError:
+                return None
+
+            if valid_until <= time.time():
+                del self._entries[digest]
+                return None
+
+            self._entries.move_to_end(digest)
+
+        # Revocation marks live as long as any entry cached before them, a single round trip checks both
+        revoked = caches[self.revocation_cache].get_many([self._get_token_revocation_key(digest),
+                                                          self._get_user_revocation_key(verified_token.user_id)])
+        if revoked:
+            # Token or user revoked on some process, verify again
+            self.evict_local(digest)
+            return None
+
+        return verified_token
+
+    def set(self, digest, verified_token, expires_on):
+        """
+        :param digest: Token digest
+        :param verified_token: VerifiedToken resolved from the token
+        :param expires_on: Expiry of the token, as seconds since epoch
+        """
+        if self.max_size <= 0:
+            return
+
+        valid_until = min(expires_on, time.time() + self.timeout)
+
+        with self._lock:
+            self._entries[digest] = (verified_token, valid_until)
+            self._entries.move_to_end(digest)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def evict(self, digest):
+        """
+        Remove a token from the caches of all processes
+        :param digest: Token digest
+        """
+        self.evict_local(digest)
+        self.revoke(digest)
+
+    def evict_local(self, digest):
+        """
+        :param digest: Token digest to remove from the cache of this process
+        """
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def revoke(self, digest):
+        """
+        Mark a token as revoked, so that it is verified again by any process having it cached
+        :param digest: Token digest
+        """
+        caches[self.revocation_cache].set(self._get_token_revocation_key(digest), True, self.timeout)
+
+    def evict_user(self, user_id):
+        """
+        Remove tokens of a user from the caches of all processes
+        :param user_id: Id of the user
+        """
+        with self._lock:
+            for digest in [digest for digest, (verified_token, valid_until) in self._entries.items()
+                           if verified_token.user_id == user_id]:
+                del self._entries[digest]
+
+        caches[self.revocation_cache].set(self._get_user_revocation_key(user_id), True, self.timeout)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _get_token_revocation_key(digest):
+        return 'revoked-token:' + digest.hex()
+
+    @staticmethod
+    def _get_user_revocation_key(user_id):
+        return 'revoked-token-user:' + str(user_id)
+
+
+verified_token_cache = VerifiedTokenCache(JWT_TOKEN_CACHE_SIZE, JWT_TOKEN_CACHE_TIMEOUT, JWT_TOKEN_REVOCATION_CACHE)
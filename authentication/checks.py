@@ -0,0 +1,21 @@
+from django.core.checks import Warning, register
+
+from common.helper_functions import is_cache_process_local
+from django_api_base.settings import JWT_TOKEN_CACHE_SIZE, JWT_TOKEN_REVOCATION_CACHE
+
+
+@register()
+def check_token_revocation_cache(app_configs, **kwargs):
+    """
+    Warn if verified tokens are cached while revocations are not shared between processes
+    """
+    if JWT_TOKEN_CACHE_SIZE > 0 and is_cache_process_local(JWT_TOKEN_REVOCATION_CACHE):
+        return [Warning(
+            'Verified token cache is enabled, but JWT_TOKEN_REVOCATION_CACHE uses a process local backend.',
+            hint='Use a shared cache backend, e.g. memcached or redis, or disable the token cache with '
+                 'jwttokencachesize=0. Otherwise tokens revoked on one process are accepted by others '
+                 'until their cache entries expire.',
+            id='authentication.W001',
+        )]
+
+    return []
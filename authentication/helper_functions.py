@@ -0,0 +1,9 @@
+import hashlib
+
+
+def get_token_digest(token):
+    """
+    :param token: Encoded jwt token
+    :return: SHA-256 digest of the token, as 32 bytes
+    """
+    return hashlib.sha256(token.encode('utf-8')).digest()
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from authentication.models import JwtToken
+
+
+class Command(BaseCommand):
+    """
+    Delete expired tokens in batches, to be run periodically
+    """
+
+    help = 'Delete expired jwt tokens in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of tokens deleted in each batch')
+        parser.add_argument('--sleep', type=float, default=0.1,
+                            help='Seconds to wait between batches')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        sleep = options['sleep']
+
+        now = timezone.now()
+        deleted_rows = 0
+        reclaimed_bytes = 0
+
+        while True:
+            with transaction.atomic():
+                token_ids = list(JwtToken.objects.filter(expires_at__lte=now)
+                                 .values_list('id', flat=True)[:chunk_size])
+
+                if token_ids:
+                    reclaimed_bytes += self._get_rows_size(token_ids)
+                    # Expired tokens are already rejected, delete without signals to skip revoking each of them
+                    tokens = JwtToken.objects.filter(id__in=token_ids)
+                    deleted_rows += tokens._raw_delete(tokens.db)
+
+            if len(token_ids) < chunk_size:
+                break
+
+            time.sleep(sleep)
+
+        if connection.vendor == 'postgresql':
+            self.stdout.write('Deleted {} expired tokens, reclaiming {} bytes'.format(deleted_rows, reclaimed_bytes))
+        else:
+            self.stdout.write('Deleted {} expired tokens'.format(deleted_rows))
+
+    @staticmethod
+    def _get_rows_size(token_ids):
+        """
+        :param token_ids: Ids of tokens to be deleted
+        :return: Total size of the rows in bytes. Only available on PostgreSQL, 0 otherwise
+        """
+        if connection.vendor != 'postgresql':
+            return 0
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COALESCE(SUM(pg_column_size(t.*)), 0) FROM {} t WHERE t.id = ANY(%s)'.format(
+                connection.ops.quote_name(JwtToken._meta.db_table)), [token_ids])
+            return cursor.fetchone()[0]
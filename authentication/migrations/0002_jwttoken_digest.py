@@ -0,0 +1,18 @@
+# Generated by Django 2.1.7 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jwttoken',
+            name='digest',
+            field=models.BinaryField(max_length=32, null=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.1.7 on 2026-10-18 10:14
+
+from django.db import migrations, transaction
+
+from authentication.helper_functions import get_token_digest
+
+BATCH_SIZE = 1000
+
+
+def forward_function(apps, schema_editor):
+    # Set digests of existing tokens, committing each batch separately to keep locks short
+    _JwtToken = apps.get_model('authentication', 'JwtToken')
+
+    last_id = 0
+    while True:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            batch = list(_JwtToken.objects.filter(id__gt=last_id)
+                         .order_by('id')
+                         .values_list('id', 'token')[:BATCH_SIZE])
+
+            for token_id, token in batch:
+                _JwtToken.objects.filter(id=token_id).update(digest=get_token_digest(token))
+
+        if len(batch) < BATCH_SIZE:
+            break
+
+        last_id = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('authentication', '0002_jwttoken_digest'),
+    ]
+
+    operations = [
+        migrations.RunPython(forward_function, migrations.RunPython.noop)
+    ]
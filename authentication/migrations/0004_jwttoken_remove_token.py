@@ -0,0 +1,22 @@
+# Generated by Django 2.1.7 on 2026-10-18 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0003_jwttoken_digest_backfill'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='jwttoken',
+            name='digest',
+            field=models.BinaryField(max_length=32, unique=True),
+        ),
+        migrations.RemoveField(
+            model_name='jwttoken',
+            name='token',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.7 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_jwttoken_remove_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jwttoken',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True, null=True),
+        ),
+    ]
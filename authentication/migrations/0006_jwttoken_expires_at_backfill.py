@@ -0,0 +1,41 @@
+# Generated by Django 2.1.7 on 2026-10-18 11:04
+
+import datetime
+
+from django.db import migrations, transaction
+from django.utils import timezone
+
+from django_api_base.settings import JWT_VALIDITY_LIMIT
+
+BATCH_SIZE = 1000
+
+
+def forward_function(apps, schema_editor):
+    # Existing tokens are stored as digests only, their exp claim is not available anymore.
+    # Expire them once the longest possible validity has passed, committing each batch separately
+    _JwtToken = apps.get_model('authentication', 'JwtToken')
+
+    expires_at = timezone.now() + datetime.timedelta(minutes=JWT_VALIDITY_LIMIT)
+
+    while True:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            batch = list(_JwtToken.objects.filter(expires_at__isnull=True)
+                         .values_list('id', flat=True)[:BATCH_SIZE])
+
+            _JwtToken.objects.filter(id__in=batch).update(expires_at=expires_at)
+
+        if len(batch) < BATCH_SIZE:
+            break
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('authentication', '0005_jwttoken_expires_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(forward_function, migrations.RunPython.noop)
+    ]
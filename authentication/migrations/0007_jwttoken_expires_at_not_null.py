@@ -0,0 +1,18 @@
+# Generated by Django 2.1.7 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0006_jwttoken_expires_at_backfill'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='jwttoken',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -1,26 +1,57 @@
 import datetime
+import uuid
 
 import jwt
 from django.db import models
 
-from django_api_base.settings import JWT_SECRET
+from authentication.helper_functions import get_token_digest
+from django_api_base.settings import JWT_SECRET, JWT_VALIDITY_LIMIT
 from common.helper_functions import convert_datetime_to_timestamp
-from profiles.models import Role
+
+
+class JwtTokenManager(models.Manager):
+    """
+    Manager for JwtToken model, storing digests of provided tokens
+    """
+
+    def create(self, token=None, **kwargs):
+        if token is not None:
+            kwargs['digest'] = get_token_digest(token)
+
+            if 'expires_at' not in kwargs:
+                # Expire with the exp claim of the token. Signature is verified by the issuer, no need to check here
+                payload = jwt.decode(token, verify=False)
+                kwargs['expires_at'] = datetime.datetime.fromtimestamp(payload['exp'], tz=datetime.timezone.utc)
+
+        token_object = super().create(**kwargs)
+
+        # Keep encoded token on the instance, to be returned to the client
+        token_object.token = token
+
+        return token_object
 
 
 class JwtToken(models.Model):
-    token = models.TextField(unique=True)
+    """
+    Model to keep issued tokens. Only SHA-256 digests of the tokens are stored
+    """
+
+    digest = models.BinaryField(max_length=32, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    objects = JwtTokenManager()
 
     @staticmethod
     def generate_jwt_token(user):
-        token_validity_limit = 1440  # Minutes
-
         payload = {
             'iss': 'toptal-calories',
+            'jti': uuid.uuid4().hex,
             'exp': convert_datetime_to_timestamp(datetime.datetime.utcnow() +
-                                                 datetime.timedelta(minutes=token_validity_limit)),
+                                                 datetime.timedelta(minutes=JWT_VALIDITY_LIMIT)),
+            'user_id': user.id,
             'username': user.username,
-            'roles': [role.type for role in Role.objects.filter(users__user=user)]
+            'roles': sorted(user.role_types),
+            'role_version': user.role_version
         }
 
         return jwt.encode(payload, JWT_SECRET).decode('utf-8')
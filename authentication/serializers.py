@@ -1,8 +1,10 @@
 from django.contrib.auth import authenticate
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 
 from authentication.models import JwtToken
 from common.exceptions import LoginFailureException
+from profiles.helper_functions import get_user_roles_prefetch
 
 
 class TokenSerializer(serializers.ModelSerializer):
@@ -21,6 +23,9 @@ class TokenSerializer(serializers.ModelSerializer):
         if not user:
             raise LoginFailureException()
 
+        # Load roles once, for both the token claims and the response
+        prefetch_related_objects([user], get_user_roles_prefetch())
+
         self.context['user'] = user
 
         return data
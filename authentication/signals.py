@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from authentication.caches import verified_token_cache
+from authentication.models import JwtToken
+from profiles.models import User, UserRole
+
+
+@receiver(post_delete, sender=JwtToken)
+def token_deleted(sender, instance, **kwargs):
+    """
+    Evict deleted tokens from the verified token caches
+    """
+    verified_token_cache.evict(bytes(instance.digest))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    """
+    Evict tokens of deleted users from the verified token caches
+    """
+    verified_token_cache.evict_user(instance.id)
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+def user_role_changed(sender, instance, **kwargs):
+    """
+    Evict tokens of users whose roles have changed, as they may carry outdated role claims
+    """
+    verified_token_cache.evict_user(instance.user_id)
@@ -1,7 +1,26 @@
+import datetime
 import json
+from io import StringIO
+from unittest import mock
 
+from django.contrib.auth.hashers import check_password
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from authentication.caches import verified_token_cache
+from authentication.checks import check_token_revocation_cache
 from authentication.constants import Messages
+from authentication.helper_functions import get_token_digest
+from authentication.models import JwtToken
+from common.constants import Messages as CommonMessages
+from common.exceptions import ServiceBusyException
+from common.hashers import hashing_pool, make_passwords
 from common.tests import BaseTests
+from profiles.constants import RoleTypes
+from profiles.models import User, Role, UserRole
 
 
 class LoginTests(BaseTests):
@@ -82,6 +101,7 @@ class MeTests(BaseTests):
         self.assertEqual(response.status_code, 403)
 
 
+@mock.patch.object(verified_token_cache, 'max_size', 10000)
 class LogoutTests(BaseTests):
     """
     Tests for logout service
@@ -101,6 +121,71 @@ class LogoutTests(BaseTests):
         response = self.client.post('/logout/', HTTP_AUTHORIZATION='Bearer ' + token)
         self.assertEqual(response.status_code, 200)
 
+    def test_token_invalid_after_logout(self):
+        """
+        We should NOT be able to use a token after logging out with it
+        """
+
+        # Create a user first
+        user_id, username, password = self._create_user()
+
+        # Get token for the user and use it once, so that it is verified
+        token = self._get_token(username, password)
+        response = self.client.get('/me/', HTTP_AUTHORIZATION='Bearer ' + token)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post('/logout/', HTTP_AUTHORIZATION='Bearer ' + token)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get('/me/', HTTP_AUTHORIZATION='Bearer ' + token)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn(Messages.TOKEN__INVALID,
+                      [message['key'] for message in json.loads(response['Messages'])])
+
+    def test_token_invalid_after_logout_on_another_process(self):
+        """
+        We should NOT be able to use a token after logging out with it on another process
+        """
+
+        user_id, username, password = self._create_user()
+
+        # Verify the token, caching it on this process
+        token = self._get_token(username, password)
+        response = self.client.get('/me/', HTTP_AUTHORIZATION='Bearer ' + token)
+        self.assertEqual(response.status_code, 200)
+
+        # Log out on another process: token row deleted without signals on this process, and revoked in shared cache
+        digest = get_token_digest(token)
+        tokens = JwtToken.objects.filter(digest=digest)
+        tokens._raw_delete(tokens.db)
+        verified_token_cache.revoke(digest)
+
+        response = self.client.get('/me/', HTTP_AUTHORIZATION='Bearer ' + token)
+        self.assertEqual(response.status_code, 401)
+
+        response = self.client.post('/logout/', HTTP_AUTHORIZATION='Bearer ' + token)
+        self.assertEqual(response.status_code, 401)
+
+    def test_logout_with_deleted_token(self):
+        """
+        We should get a 401 status code when logging out with a token already deleted, even if it is still cached
+        """
+
+        user_id, username, password = self._create_user()
+
+        token = self._get_token(username, password)
+        response = self.client.get('/me/', HTTP_AUTHORIZATION='Bearer ' + token)
+        self.assertEqual(response.status_code, 200)
+
+        # Delete token row without signals, leaving it in the token cache of this process
+        tokens = JwtToken.objects.filter(digest=get_token_digest(token))
+        tokens._raw_delete(tokens.db)
+
+        response = self.client.post('/logout/', HTTP_AUTHORIZATION='Bearer ' + token)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn(Messages.TOKEN__INVALID,
+                      [message['key'] for message in json.loads(response['Messages'])])
+
     def test_get_me_without_token(self):
         """
         We should get a 403 status code without a token in the request
@@ -108,3 +193,208 @@ class LogoutTests(BaseTests):
 
         response = self.client.post('/logout/')
         self.assertEqual(response.status_code, 403)
+
+
+class PurgeExpiredTokensTests(BaseTests):
+    """
+    Tests for purge_expired_tokens command
+    """
+
+    def test_purge_expired_tokens(self):
+        """
+        Expired tokens should be deleted, valid tokens should be kept
+        """
+
+        user = User.objects.create_user(username=self.faker.email(),
+                                        email=self.faker.email(), password=self.faker.password(length=10))
+
+        for _ in range(5):
+            JwtToken.objects.create(token=JwtToken.generate_jwt_token(user),
+                                    expires_at=timezone.now() - datetime.timedelta(minutes=1))
+        valid_token = JwtToken.objects.create(token=JwtToken.generate_jwt_token(user))
+
+        with CaptureQueriesContext(connection) as context, \
+                mock.patch.object(verified_token_cache, 'revoke') as revoke_mock:
+            call_command('purge_expired_tokens', chunk_size=2, sleep=0, stdout=StringIO())
+
+        self.assertEqual(list(JwtToken.objects.values_list('id', flat=True)), [valid_token.id])
+
+        # Each batch deleted in a single query, without revoking expired tokens
+        self.assertEqual(len([query for query in context.captured_queries if query['sql'].startswith('DELETE')]), 3)
+        revoke_mock.assert_not_called()
+
+
+@mock.patch.object(verified_token_cache, 'max_size', 10000)
+@mock.patch('authentication.authenticators.JWT_TRUST_ROLE_CLAIMS', True)
+class RoleClaimTests(BaseTests):
+    """
+    Tests for authorization with role claims of tokens
+    """
+
+    def setUp(self):
+        super().setUp()
+
+        self.administrator = User.objects.create_user(username=self.faker.email(), email=self.faker.email(),
+                                                      password=self.faker.password(length=10))
+        self.administrator_role = UserRole.objects.create(user=self.administrator,
+                                                          role=Role.objects.get(type=RoleTypes.ADMINISTRATOR))
+        self.administrator_token = JwtToken.objects.create(
+            token=JwtToken.generate_jwt_token(self.administrator)).token
+
+    def test_authorize_with_role_claims(self):
+        """
+        We should be authorized by the role claims of the token, without loading roles from database
+        """
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/users/typeahead/', HTTP_AUTHORIZATION='Bearer ' + self.administrator_token)
+            self.assertEqual(response.status_code, 200)
+
+        self.assertFalse([query for query in context.captured_queries if 'profiles_userrole' in query['sql']])
+
+    def test_token_invalid_after_role_change(self):
+        """
+        We should NOT be able to use a token issued before the roles of the user changed
+        """
+
+        response = self.client.get('/users/', HTTP_AUTHORIZATION='Bearer ' + self.administrator_token)
+        self.assertEqual(response.status_code, 200)
+
+        self.administrator_role.delete()
+
+        response = self.client.get('/users/', HTTP_AUTHORIZATION='Bearer ' + self.administrator_token)
+        self.assertEqual(response.status_code, 401)
+
+
+@mock.patch.object(verified_token_cache, 'max_size', 10000)
+class TokenUserTests(BaseTests):
+    """
+    Tests for users built from token claims
+    """
+
+    def test_logout_without_loading_user(self):
+        """
+        We should be able to log out with a verified token without loading the user from database
+        """
+
+        # Create a user first
+        user_id, username, password = self._create_user()
+
+        # Get token for the user and use it once, so that it is verified
+        token = self._get_token(username, password)
+        response = self.client.get('/me/', HTTP_AUTHORIZATION='Bearer ' + token)
+        self.assertEqual(response.status_code, 200)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/logout/', HTTP_AUTHORIZATION='Bearer ' + token)
+            self.assertEqual(response.status_code, 200)
+
+        self.assertFalse([query for query in context.captured_queries if 'profiles_user' in query['sql']])
+
+    def test_token_invalid_after_user_deleted(self):
+        """
+        We should NOT be able to use a verified token after its user is deleted
+        """
+
+        # Create a user first
+        user_id, username, password = self._create_user()
+
+        # Get token for the user and use it once, so that it is verified
+        token = self._get_token(username, password)
+        response = self.client.get('/me/', HTTP_AUTHORIZATION='Bearer ' + token)
+        self.assertEqual(response.status_code, 200)
+
+        User.objects.get(pk=user_id).delete()
+
+        response = self.client.get('/me/', HTTP_AUTHORIZATION='Bearer ' + token)
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(PASSWORD_HASHERS=['common.hashers.PooledPBKDF2PasswordHasher'])
+class PasswordHashingTests(BaseTests):
+    """
+    Tests for password hashing on the hashing pool
+    """
+
+    def test_login_with_pooled_hasher(self):
+        """
+        We should be able to register and login with passwords hashed on the hashing pool
+        """
+
+        user_id, username, password = self._create_user()
+        self.assertTrue(User.objects.get(pk=user_id).password.startswith('pbkdf2_sha256$'))
+
+        self.assertTrue(self._get_token(username, password))
+
+    def test_login_with_saturated_pool(self):
+        """
+        We should get a 503 status code with a Retry-After header while the hashing pool is saturated
+        """
+
+        user_id, username, password = self._create_user()
+
+        with mock.patch.object(hashing_pool, 'max_workers', 1), \
+                mock.patch.object(hashing_pool, 'submit', side_effect=ServiceBusyException(5)):
+            response = self.client.post('/login/', data={
+                'username': username,
+                'password': password
+            })
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+        self.assertIn(CommonMessages.SERVICE_BUSY,
+                      [message['key'] for message in json.loads(response['Messages'])])
+
+
+    def test_make_passwords_with_single_thread_pool(self):
+        """
+        Bulk hashing should NOT take the only thread of the hashing pool
+        """
+
+        with mock.patch.object(hashing_pool, 'max_workers', 1), \
+                mock.patch.object(hashing_pool, 'submit', wraps=hashing_pool.submit) as submit_mock:
+            encoded_passwords = make_passwords(['password1', 'password2'])
+
+        submit_mock.assert_not_called()
+        self.assertTrue(check_password('password1', encoded_passwords[0]))
+        self.assertTrue(check_password('password2', encoded_passwords[1]))
+
+    def test_make_passwords_with_pool(self):
+        """
+        Bulk hashing should hash on half of the hashing pool, keeping the order of passwords
+        """
+
+        with mock.patch.object(hashing_pool, 'max_workers', 4), \
+                mock.patch.object(hashing_pool, 'submit', wraps=hashing_pool.submit) as submit_mock:
+            encoded_passwords = make_passwords(['password1', 'password2', 'password3'])
+
+        self.assertEqual(submit_mock.call_count, 3)
+        self.assertEqual([check_password('password{}'.format(index + 1), encoded_password)
+                          for index, encoded_password in enumerate(encoded_passwords)], [True, True, True])
+
+class TokenCacheCheckTests(BaseTests):
+    """
+    Tests for the system check of the token cache configuration
+    """
+
+    @mock.patch('authentication.checks.JWT_TOKEN_CACHE_SIZE', 10000)
+    def test_token_cache_with_process_local_revocation_cache(self):
+        """
+        We should get a warning when tokens are cached but revocations are not shared between processes
+        """
+
+        local_caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=local_caches):
+            self.assertEqual([warning.id for warning in check_token_revocation_cache(None)], ['authentication.W001'])
+
+        shared_caches = {'default': {'BACKEND': 'django.core.cache.backends.memcached.PyLibMCCache'}}
+        with override_settings(CACHES=shared_caches):
+            self.assertFalse(check_token_revocation_cache(None))
+
+    @mock.patch('authentication.checks.JWT_TOKEN_CACHE_SIZE', 0)
+    def test_token_cache_disabled(self):
+        """
+        We should NOT get a warning when the token cache is disabled
+        """
+
+        self.assertFalse(check_token_revocation_cache(None))
@@ -0,0 +1,65 @@
+from django.utils.functional import cached_property
+
+from profiles.models import User, UserRole
+
+
+class TokenUser:
+    """
+    Lightweight user built from the claims of a verified token. Provides id, username and role types without
+    querying the database, and loads the User object only when any other attribute is accessed
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id, username, role_types=None):
+        self.id = self.pk = user_id
+        self.username = username
+
+        if role_types is not None:
+            self.role_types = role_types
+
+    @cached_property
+    def role_types(self):
+        """
+        Types of the roles assigned to the user, loaded from database if not provided by the token
+        """
+        return frozenset(UserRole.objects.filter(user_id=self.id).values_list('role__type', flat=True))
+
+    @cached_property
+    def user(self):
+        """
+        User object for the token, loaded from database on first access
+        """
+        from common.exceptions import InvalidTokenException
+
+        try:
+            user = User.objects.get(pk=self.id)
+        except User.DoesNotExist:
+            # User deleted after token was verified
+            raise InvalidTokenException()
+
+        # Share role types if already known
+        if 'role_types' in self.__dict__:
+            user.role_types = self.role_types
+
+        return user
+
+    def __getattr__(self, name):
+        # Only called for attributes not provided by the token
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        return getattr(self.user, name)
+
+    def __eq__(self, other):
+        if isinstance(other, (TokenUser, User)):
+            return self.pk == other.pk
+
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return self.username
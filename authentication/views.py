@@ -1,13 +1,15 @@
-import json
-
 from rest_framework.generics import GenericAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from authentication.constants import Messages
+from authentication.helper_functions import get_token_digest
 from authentication.models import JwtToken
 from authentication.serializers import TokenSerializer
-from common.helper_functions import get_message_object
+from common.exceptions import InvalidTokenException
+from common.helper_functions import build_message_response
+from profiles.helper_functions import get_user_roles_prefetch
+from profiles.models import User
 from profiles.serializers import UserSerializer
 
 
@@ -44,7 +46,13 @@ class MeView(GenericAPIView):
     permission_classes = (IsAuthenticated,)
 
     def get(self, request, *args, **kwargs):
-        serializer = self.get_serializer(request.user)
+        try:
+            user = User.objects.prefetch_related(get_user_roles_prefetch()).get(pk=request.user.pk)
+        except User.DoesNotExist:
+            # User deleted after token was verified
+            raise InvalidTokenException()
+
+        serializer = self.get_serializer(user)
         return Response(serializer.data)
 
 
@@ -57,8 +65,10 @@ class LogoutView(GenericAPIView):
 
     def post(self, request, *args, **kwargs):
         token = request.META.get('HTTP_AUTHORIZATION').split(' ')[1]
-        JwtToken.objects.get(token=token).delete()
+        deleted, _ = JwtToken.objects.filter(digest=get_token_digest(token)).delete()
+
+        if not deleted:
+            # Token already deleted, e.g. logged out on another process
+            raise InvalidTokenException()
 
-        return Response({}, headers={
-            'Messages': json.dumps([get_message_object(Messages.TOKEN__LOGOUT_SUCCESS)])
-        })
+        return build_message_response(request, Messages.TOKEN__LOGOUT_SUCCESS)
@@ -10,6 +10,7 @@ class Messages:
     REQUEST_PARAMETER_MISSING = '0_0_1'
     HEADER_PARAMETER_MISSING = '0_0_2'
     REQUEST_PARAMETER_INVALID = '0_0_3'
+    SERVICE_BUSY = '0_0_4'
 
     def __init__(self):
         pass
@@ -27,3 +28,17 @@ class MessageTypes:
 
     def __init__(self):
         pass
+
+
+class PaginationCountStrategies:
+    """
+    Values for the strategies used to compute Pagination-Count header
+    """
+
+    EXACT = 'exact'  # Count rows on each request
+    ESTIMATE = 'estimate'  # Use planner estimate for unfiltered querysets on large tables, exact count otherwise
+    CACHED = 'cached'  # Count rows and cache the result for a short time, per query
+    NONE = 'none'  # Omit Pagination-Count header
+
+    def __init__(self):
+        pass
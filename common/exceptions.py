@@ -1,15 +1,12 @@
-import json
-
-from common.constants import MessageTypes
-from rest_framework.exceptions import ErrorDetail, PermissionDenied
-from rest_framework.response import Response
-from rest_framework.utils.serializer_helpers import ReturnDict
+from common.constants import MessageTypes, Messages
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.views import exception_handler
 from rest_framework import status, exceptions
 from rest_framework.serializers import ValidationError
 
-from common.helper_functions import get_message_object
+from common.helper_functions import build_messages_response, build_message_response
 from authentication.constants import Messages as AuthenticationMessages
+from django_api_base.settings import VALIDATION_MESSAGES_LIMIT
 
 
 class InvalidTokenException(exceptions.AuthenticationFailed):
@@ -26,53 +23,80 @@ class LoginFailureException(exceptions.AuthenticationFailed):
     pass
 
 
-def process_error_list(exception_detail, messages, parent_key=None):
+class ServiceBusyException(exceptions.APIException):
+    """
+    Exception to be raised when the request can not be served due to load, and should be retried later
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    def __init__(self, retry_after):
+        super().__init__()
+        self.retry_after = retry_after
+
+
+def process_error_list(exception_detail, messages, limit=None):
     """
-    Process validations errors in a recursive manner, adding each message to messages list.
-    Errors may be returned in multiple levels in case of nested serializer usage
+    Flatten validation errors into message objects, adding each message to messages list.
+    Errors may be nested to any depth in case of nested or list serializer usage. They are walked iteratively,
+    and each message is labelled with the path of the field, e.g. "Row 2 Username: ..."
+    :param exception_detail: Detail of the validation error
+    :param messages: List to add message objects to
+    :param limit: Maximum number of messages to add, all messages if not provided
     """
 
-    if type(exception_detail) is list:
-        # Custom generated exception, not related to a field. Use directly.
-        for exception_data in exception_detail:
-            messages.append(exception_data)
-
-    elif type(exception_detail) == ReturnDict:
-        # List of errors related to a field, raised from a serializer. Go over the fields
-        for key in exception_detail:
-
-            if key == 'non_field_errors':
-                # Raised from generic validate method of a serializer
-                for error in exception_detail[key]:
-                    messages.append(error)
-
-            else:
-                exception_data = exception_detail[key]
-
-                if type(exception_data) is list:
-                    # If multiple messages returned for same field, use only the first
-                    exception_data = exception_data[0]
-
-                if type(exception_data) == ErrorDetail:
-                    # DRF generated error, build message object here
-                    if parent_key:
-                        error_message = (parent_key.capitalize() + ' ' + key.capitalize()) + ': ' + exception_data
-                    else:
-                        error_message = key.capitalize() + ': ' + exception_data
-
-                    messages.append({
-                        'key': None,
-                        'type': MessageTypes.ERROR,
-                        'body': error_message
-                    })
-
-                elif type(exception_data) is dict:
-                    if 'key' in exception_data:
-                        # Custom generated exception. Use directly
-                        messages.append(exception_detail[key][0])
-                    else:
-                        # Second level validation error
-                        process_error_list(exception_data, messages, key)
+    # Items to process, each with labels of the serializer it belongs to and of the field
+    stack = [(exception_detail, (), None)]
+
+    while stack and (limit is None or len(messages) < limit):
+        detail, path, field = stack.pop()
+
+        if isinstance(detail, dict) and 'key' in detail:
+            # Custom generated message. Use directly, labelled with the row or nested field it belongs to
+            if path:
+                detail = dict(detail, body=' '.join(path) + ': ' + detail['body'])
+            messages.append(detail)
+
+        elif isinstance(detail, dict):
+            # Errors raised from a serializer. Go over the fields, keeping their order
+            if field:
+                path += (field,)
+
+            for key, field_detail in reversed(list(detail.items())):
+                if key == 'non_field_errors':
+                    # Raised from generic validate method of a serializer, not related to a field
+                    label = None
+                elif isinstance(key, int):
+                    # Index of an item in a list field, numbered from 1 as rows are
+                    label = str(key + 1)
+                else:
+                    label = str(key).capitalize()
+
+                stack.append((field_detail, path, label))
+
+        elif isinstance(detail, list):
+            # Errors of a field, or errors of each item of a list serializer. Valid items have no errors
+            items = []
+            for index, item_detail in enumerate(detail):
+                if isinstance(item_detail, dict) and 'key' not in item_detail:
+                    if item_detail:
+                        if field:
+                            items.append((item_detail, path + (field, str(index + 1)), None))
+                        else:
+                            items.append((item_detail, path + ('Row ' + str(index + 1),), None))
+                else:
+                    items.append((item_detail, path, field))
+
+            stack.extend(reversed(items))
+
+        else:
+            # DRF generated error, build message object here
+            label = path + (field,) if field else path
+
+            messages.append({
+                'key': None,
+                'type': MessageTypes.ERROR,
+                'body': ' '.join(label) + ': ' + detail if label else str(detail)
+            })
 
 
 def base_exception_handler(exc, context):
@@ -80,28 +104,29 @@ def base_exception_handler(exc, context):
     Global exception handler.
     """
 
+    request = context.get('request')
+
     if isinstance(exc, ValidationError):
         messages = []
 
-        process_error_list(exc.detail, messages)
+        process_error_list(exc.detail, messages, VALIDATION_MESSAGES_LIMIT)
 
-        return Response({}, status.HTTP_400_BAD_REQUEST, headers={
-            'Messages': json.dumps(messages)
-        })
+        return build_messages_response(request, messages, status.HTTP_400_BAD_REQUEST)
 
     elif isinstance(exc, InvalidTokenException):
-        return Response({}, status.HTTP_401_UNAUTHORIZED, headers={
-            'Messages': json.dumps([get_message_object(AuthenticationMessages.TOKEN__INVALID)])
-        })
+        return build_message_response(request, AuthenticationMessages.TOKEN__INVALID, status.HTTP_401_UNAUTHORIZED)
 
     elif isinstance(exc, LoginFailureException):
-        return Response({}, status.HTTP_401_UNAUTHORIZED, headers={
-            'Messages': json.dumps([get_message_object(AuthenticationMessages.TOKEN__AUTHENTICATION_FAILED)])
-        })
+        return build_message_response(request, AuthenticationMessages.TOKEN__AUTHENTICATION_FAILED,
+                                      status.HTTP_401_UNAUTHORIZED)
 
     elif isinstance(exc, PermissionDenied):
-        return Response({}, status.HTTP_403_FORBIDDEN, headers={
-            'Messages': json.dumps([get_message_object(AuthenticationMessages.TOKEN__PERMISSION_DENIED)])
+        return build_message_response(request, AuthenticationMessages.TOKEN__PERMISSION_DENIED,
+                                      status.HTTP_403_FORBIDDEN)
+
+    elif isinstance(exc, ServiceBusyException):
+        return build_message_response(request, Messages.SERVICE_BUSY, status.HTTP_503_SERVICE_UNAVAILABLE, headers={
+            'Retry-After': str(exc.retry_after)
         })
 
     # Call default DRF exception handler if not returned above
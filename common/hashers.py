@@ -0,0 +1,120 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, get_hasher, make_password
+
+from common.exceptions import ServiceBusyException
+from django_api_base.settings import PASSWORD_HASHING_WORKERS, PASSWORD_HASHING_QUEUE_SIZE, \
+    PASSWORD_HASHING_QUEUE_TIMEOUT, PASSWORD_HASHING_RETRY_AFTER
+
+
+class HashingPool:
+    """
+    Bounded pool of threads to run password hashing on. PBKDF2 releases the GIL, so hashes are computed in parallel
+    while the number of concurrent hashes, and the number of requests waiting for one, stay bounded
+    """
+
+    def __init__(self, max_workers, queue_size, queue_timeout, retry_after):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Threads do not survive forks, create the executor in each worker process
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='password-hashing')
+                self._slots = threading.BoundedSemaphore(self.max_workers + self.queue_size)
+                self._pid = os.getpid()
+
+            return self._executor, self._slots
+
+    def submit(self, fn, *args):
+        """
+        Submit fn to the pool
+        :return: Future for the result of fn
+        :raises ServiceBusyException: If the pool stays saturated for queue timeout
+        """
+        executor, slots = self._get_executor()
+
+        if not slots.acquire(timeout=self.queue_timeout):
+            raise ServiceBusyException(self.retry_after)
+
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+
+        future.add_done_callback(lambda f: slots.release())
+
+        return future
+
+    def run(self, fn, *args):
+        """
+        Run fn on the pool and wait for its result. Runs fn directly if pool is disabled
+        """
+        if self.max_workers <= 0:
+            return fn(*args)
+
+        return self.submit(fn, *args).result()
+
+
+hashing_pool = HashingPool(PASSWORD_HASHING_WORKERS, PASSWORD_HASHING_QUEUE_SIZE,
+                           PASSWORD_HASHING_QUEUE_TIMEOUT, PASSWORD_HASHING_RETRY_AFTER)
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 password hasher computing hashes on the hashing pool. Produces the same hashes as PBKDF2PasswordHasher
+    """
+
+    def encode(self, password, salt, iterations=None):
+        return hashing_pool.run(super().encode, password, salt, iterations)
+
+
+# Serializes bulk hashing within a process, so that concurrent bulk requests do not add up to the whole pool
+bulk_hashing_lock = threading.Lock()
+
+
+def make_passwords(passwords):
+    """
+    Hash multiple passwords. If the default hasher is pooled, hashes in parallel on up to half of the hashing pool,
+    always leaving at least one thread to other requests. With a single thread, hashes on the request thread instead
+    :param passwords: List of raw passwords
+    :return: List of encoded passwords, in the same order
+    """
+    hasher = get_hasher()
+
+    if not isinstance(hasher, PooledPBKDF2PasswordHasher) or hashing_pool.max_workers <= 0:
+        return [make_password(password) for password in passwords]
+
+    with bulk_hashing_lock:
+        if hashing_pool.max_workers == 1:
+            # Keep the only thread of the pool to other requests, e.g. logins
+            return [PBKDF2PasswordHasher.encode(hasher, password, hasher.salt()) for password in passwords]
+
+        # Keep at most half of the workers busy, so that other requests do not wait behind all the hashes
+        max_pending = hashing_pool.max_workers // 2
+
+        encoded_passwords = []
+        pending = deque()
+        for password in passwords:
+            if len(pending) >= max_pending:
+                encoded_passwords.append(pending.popleft().result())
+
+            # Submit the unpooled encode directly, pooled encode would wait on the pool from within the pool
+            pending.append(hashing_pool.submit(PBKDF2PasswordHasher.encode, hasher, password, hasher.salt()))
+
+        encoded_passwords.extend(future.result() for future in pending)
+
+    return encoded_passwords
@@ -1,8 +1,67 @@
 import datetime
+import json
+import time
+
+from django.conf import settings
+from django.http.multipartparser import parse_header
+from rest_framework import HTTP_HEADER_ENCODING, status
+from rest_framework.response import Response
 
 from common.constants import Messages
 from common.models import Message
 from common.serializers import MessageSerializer
+from django_api_base.settings import MESSAGE_CATALOG_TIMEOUT, MESSAGES_IN_BODY, VALIDATION_MESSAGES_HEADER_LIMIT
+
+# Cache backends not shared between processes
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Process local message catalog, mapping message keys to serialized message data
+_message_catalog = None
+_message_catalog_loaded_on = None
+# Messages header values for single messages, built together with the catalog
+_message_headers = {}
+
+
+def load_message_catalog():
+    """
+    Load all messages into the process local catalog
+    :return: Catalog dictionary, mapping message keys to serialized message data
+    """
+    global _message_catalog, _message_catalog_loaded_on, _message_headers
+
+    catalog = {}
+    for message_data in MessageSerializer(Message.objects.all(), many=True).data:
+        catalog[message_data['key']] = dict(message_data)
+
+    _message_headers = {key: json.dumps([message_data]) for key, message_data in catalog.items()}
+    _message_catalog = catalog
+    _message_catalog_loaded_on = time.monotonic()
+
+    return catalog
+
+
+def clear_message_catalog():
+    """
+    Drop the process local message catalog, so it is reloaded on next access
+    """
+    global _message_catalog
+
+    _message_catalog = None
+
+
+def get_message_catalog():
+    """
+    :return: Process local message catalog. Loaded from database on first access or once it has expired
+    """
+    catalog = _message_catalog
+
+    if catalog is None or time.monotonic() - _message_catalog_loaded_on > MESSAGE_CATALOG_TIMEOUT:
+        catalog = load_message_catalog()
+
+    return catalog
 
 
 def get_message_object(message_key):
@@ -10,11 +69,16 @@ def get_message_object(message_key):
     :param message_key: Key for the message
     :return: Message serializer data for the key. If no entry found for message_key, returns a generic error message
     """
+    catalog = get_message_catalog()
+
     try:
-        return MessageSerializer(Message.objects.get(key=message_key)).data
-    except Message.DoesNotExist:
+        return dict(catalog[message_key])
+    except KeyError:
         # If no message data provided for message_key, return a default message
-        message_data = MessageSerializer(Message.objects.get(key=Messages.UNHANDLED_ERROR)).data
+        try:
+            message_data = dict(catalog[Messages.UNHANDLED_ERROR])
+        except KeyError:
+            raise Message.DoesNotExist()
 
         # Replace 'key' field with provided message_key
         message_data['key'] = message_key
@@ -22,9 +86,107 @@ def get_message_object(message_key):
         return message_data
 
 
+def get_message_header(message_key):
+    """
+    :param message_key: Key for the message
+    :return: Value of Messages header with the single message for the key. Prebuilt for the messages in catalog
+    """
+    get_message_catalog()
+
+    try:
+        return _message_headers[message_key]
+    except KeyError:
+        # Not in catalog, build with the generic error message
+        return json.dumps([get_message_object(message_key)])
+
+
+def get_media_type_params(media_type):
+    """
+    :param media_type: Media type, e.g. accepted media type of a request
+    :return: Dictionary of media type parameters. Empty if media type can not be encoded as a header
+    """
+    try:
+        _, params = parse_header(media_type.encode(HTTP_HEADER_ENCODING))
+    except UnicodeEncodeError:
+        return {}
+
+    return {key: value.decode(HTTP_HEADER_ENCODING) for key, value in params.items()}
+
+
+def messages_in_body(request):
+    """
+    :param request: DRF request
+    :return: True if messages should be sent in response body, as requested with "messages" parameter of Accept
+    header or by MESSAGES_IN_BODY setting
+    """
+    accepted_media_type = getattr(request, 'accepted_media_type', None)
+
+    if accepted_media_type:
+        params = get_media_type_params(accepted_media_type)
+
+        if params.get('messages') in ('body', 'header'):
+            return params['messages'] == 'body'
+
+    return MESSAGES_IN_BODY
+
+
+def build_messages_response(request, messages, status_code=status.HTTP_200_OK, headers=None):
+    """
+    Build a response with messages. Messages are sent in Messages header, or in response body as
+    {"messages": [...]} if requested, with only their count and the first key in headers.
+    Messages that do not fit in Messages header are sent in response body as well
+    :param request: DRF request
+    :param messages: List of message objects
+    :param status_code: Status code of the response
+    :param headers: Additional headers of the response
+    :return: DRF response
+    """
+    data = {}
+    headers = dict(headers or {})
+
+    if messages_in_body(request):
+        data['messages'] = messages
+        headers['Messages-Count'] = str(len(messages))
+        if messages and messages[0].get('key'):
+            headers['Messages-Key'] = messages[0]['key']
+
+    elif len(messages) > VALIDATION_MESSAGES_HEADER_LIMIT:
+        # Too many messages for a header, which proxies limit in size. Send all of them in body as well
+        data['messages'] = messages
+        headers['Messages'] = json.dumps(messages[:VALIDATION_MESSAGES_HEADER_LIMIT])
+
+    else:
+        headers['Messages'] = json.dumps(messages)
+
+    return Response(data, status_code, headers=headers)
+
+
+def build_message_response(request, message_key, status_code=status.HTTP_200_OK, headers=None):
+    """
+    Build a response with a single message from catalog, using prebuilt Messages header
+    :param request: DRF request
+    :param message_key: Key for the message
+    :param status_code: Status code of the response
+    :param headers: Additional headers of the response
+    :return: DRF response
+    """
+    if messages_in_body(request):
+        return build_messages_response(request, [get_message_object(message_key)], status_code, headers)
+
+    return Response({}, status_code, headers=dict(headers or {}, Messages=get_message_header(message_key)))
+
+
 def convert_datetime_to_timestamp(datetime_object):
     """
     :param datetime_object: A python datetime object
     :return: Provided datetime converted to seconds since epoch
     """
     return (datetime_object - datetime.datetime(1970, 1, 1)).total_seconds()
+
+
+def is_cache_process_local(alias):
+    """
+    :param alias: Cache alias
+    :return: True if the cache is not shared between processes
+    """
+    return settings.CACHES.get(alias, {}).get('BACKEND') in PROCESS_LOCAL_CACHE_BACKENDS
@@ -0,0 +1,128 @@
+import re
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.module_loading import import_string
+from django.utils.text import compress_string
+
+from django_api_base.settings import COMPRESSION_MIN_SIZE, COMPRESSION_BROTLI_QUALITY, ADMIN_MIDDLEWARE, \
+    ADMIN_URL_PREFIX
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+re_accepts_brotli = re.compile(r'\bbr\b')
+re_accepts_gzip = re.compile(r'\bgzip\b')
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress responses of at least COMPRESSION_MIN_SIZE bytes with brotli if it is installed and accepted by
+    the client, with gzip otherwise. Smaller responses are not worth the CPU time, and streaming responses
+    are sent as they are
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding') or \
+                len(response.content) < COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+        if brotli is not None and re_accepts_brotli.search(accept_encoding):
+            content = brotli.compress(response.content, quality=COMPRESSION_BROTLI_QUALITY)
+            content_encoding = 'br'
+        elif re_accepts_gzip.search(accept_encoding):
+            content = compress_string(response.content)
+            content_encoding = 'gzip'
+        else:
+            return response
+
+        # Return the original content if compression does not help
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = content_encoding
+
+        # Content differs from the one the ETag was computed for
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+
+        return response
+
+
+class AdminMiddleware:
+    """
+    Applies ADMIN_MIDDLEWARE to requests under ADMIN_URL_PREFIX only, in the same way as they would be applied if
+    they were listed in MIDDLEWARE in place of this middleware. Other requests skip them
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        # Build the admin middleware chain, as Django does for MIDDLEWARE
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._exception_middleware = []
+
+        handler = convert_exception_to_response(get_response)
+        for middleware_path in reversed(ADMIN_MIDDLEWARE):
+            try:
+                mw_instance = import_string(middleware_path)(handler)
+            except MiddlewareNotUsed:
+                continue
+
+            if hasattr(mw_instance, 'process_view'):
+                self._view_middleware.insert(0, mw_instance.process_view)
+            if hasattr(mw_instance, 'process_template_response'):
+                self._template_response_middleware.append(mw_instance.process_template_response)
+            if hasattr(mw_instance, 'process_exception'):
+                self._exception_middleware.append(mw_instance.process_exception)
+
+            handler = convert_exception_to_response(mw_instance)
+
+        self._admin_chain = handler
+
+    def __call__(self, request):
+        if self._is_admin_request(request):
+            return self._admin_chain(request)
+
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self._is_admin_request(request):
+            for middleware_method in self._view_middleware:
+                response = middleware_method(request, view_func, view_args, view_kwargs)
+                if response:
+                    return response
+
+        return None
+
+    def process_template_response(self, request, response):
+        if self._is_admin_request(request):
+            for middleware_method in self._template_response_middleware:
+                response = middleware_method(request, response)
+
+        return response
+
+    def process_exception(self, request, exception):
+        if self._is_admin_request(request):
+            for middleware_method in self._exception_middleware:
+                response = middleware_method(request, exception)
+                if response:
+                    return response
+
+        return None
+
+    @staticmethod
+    def _is_admin_request(request):
+        return request.path_info.startswith(ADMIN_URL_PREFIX)
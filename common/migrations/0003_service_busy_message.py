@@ -0,0 +1,31 @@
+# Generated by Django 2.1.7 on 2026-10-18 15:40
+
+from django.db import migrations
+
+from common.constants import Messages as CommonMessages, MessageTypes
+
+
+def forward_function(apps, schema_editor):
+    # Create message objects
+    _Message = apps.get_model('common', 'Message')
+
+    _Message.objects.create(key=CommonMessages.SERVICE_BUSY,
+                            type=MessageTypes.ERROR,
+                            body='Service busy, please try again later.', )
+
+
+def backward_function(apps, schema_editor):
+    _Message = apps.get_model('common', 'Message')
+
+    _Message.objects.filter(key=CommonMessages.SERVICE_BUSY).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0002_data_migrations'),
+    ]
+
+    operations = [
+        migrations.RunPython(forward_function, backward_function)
+    ]
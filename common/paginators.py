@@ -1,16 +1,152 @@
-from rest_framework.pagination import LimitOffsetPagination
+import hashlib
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from common.constants import PaginationCountStrategies
+from django_api_base.settings import PAGINATION_COUNT_STRATEGY, PAGINATION_COUNT_CACHE_TIMEOUT, \
+    PAGINATION_COUNT_ESTIMATE_THRESHOLD
 
 
 class HeaderLimitOffsetPagination(LimitOffsetPagination):
     """
-    Custom paginator, to return pagination data in response headers
+    Custom paginator, to return pagination data in response headers.
+    Clients may switch to cursor pagination by providing "pagination=cursor" query parameter
     """
 
+    pagination_query_param = 'pagination'
+    cursor_pagination_mode = 'cursor'
+
+    cursor_paginator = None
+    has_next = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.pagination_query_param) == self.cursor_pagination_mode or \
+                HeaderCursorPagination.cursor_query_param in request.query_params:
+            # Cursor pagination requested
+            self.cursor_paginator = HeaderCursorPagination()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            # Pagination not requested, no need to count
+            return None
+
+        count_strategy = getattr(view, 'pagination_count_strategy', PAGINATION_COUNT_STRATEGY)
+
+        if count_strategy == PaginationCountStrategies.EXACT:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.offset = self.get_offset(request)
+        self.request = request
+
+        # Count may be inexact or omitted. Fetch an extra row to find out whether there is a next page
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+
+        if count_strategy == PaginationCountStrategies.ESTIMATE:
+            self.count = self.get_estimated_count(queryset)
+        elif count_strategy == PaginationCountStrategies.CACHED:
+            self.count = self.get_cached_count(queryset)
+        else:
+            self.count = None
+
+        return results[:self.limit]
+
+    def get_estimated_count(self, queryset):
+        """
+        :return: Planner estimate of the row count for unfiltered querysets on large PostgreSQL tables,
+        exact count otherwise
+        """
+        connection = connections[queryset.db]
+
+        if connection.vendor != 'postgresql' or queryset.query.where or queryset.query.distinct:
+            return self.get_count(queryset)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                           [connection.ops.quote_name(queryset.model._meta.db_table)])
+            row = cursor.fetchone()
+
+        if not row or row[0] < PAGINATION_COUNT_ESTIMATE_THRESHOLD:
+            return self.get_count(queryset)
+
+        return row[0]
+
+    def get_cached_count(self, queryset):
+        """
+        :return: Row count of the queryset, cached per query for a short time
+        """
+        try:
+            query = str(queryset.query)
+        except EmptyResultSet:
+            return 0
+
+        cache_key = 'pagination-count:' + hashlib.md5(query.encode('utf-8')).hexdigest()
+
+        count = cache.get(cache_key)
+        if count is None:
+            count = self.get_count(queryset)
+            cache.set(cache_key, count, PAGINATION_COUNT_CACHE_TIMEOUT)
+
+        return count
+
+    def get_next_link(self):
+        if self.has_next is None:
+            return super().get_next_link()
+
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator:
+            return self.cursor_paginator.get_paginated_response(data)
+
+        headers = {}
+
+        if self.count is not None:
+            headers['Pagination-Count'] = self.count
+
+        # Build page headers for pagination
+        if self.get_next_link():
+            headers['Pagination-Next'] = self.get_next_link()
+        if self.get_previous_link():
+            headers['Pagination-Previous'] = self.get_previous_link()
+
+        return Response(data, headers=headers)
+
+
+class HeaderCursorPagination(CursorPagination):
+    """
+    Custom cursor paginator, to return pagination data in response headers.
+    Pages are fetched by seeking on an indexed ordering, so that deep pages cost the same as the first one.
+    Ordering can be set per view with "cursor_ordering" attribute, defaults to id
+    """
+
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None)
+
+        if ordering:
+            return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+
+        return super().get_ordering(request, queryset, view)
+
     def get_paginated_response(self, data):
-        headers = {
-            'Pagination-Count': self.count
-        }
+        headers = {}
 
         # Build page headers for pagination
         if self.get_next_link():
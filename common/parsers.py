@@ -0,0 +1,53 @@
+import codecs
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Fastest available JSON decoder
+json_loads = orjson.loads if orjson else json.loads
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSON parser decoding with orjson. Falls back to JSONParser if orjson is not installed,
+    or if request is not encoded in UTF-8
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline delimited JSON, one JSON document per line, into a list
+    """
+
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            lines = stream.read().decode(encoding).splitlines()
+
+            # Skip blank lines, e.g. trailing new line at the end of the payload
+            return [json_loads(line) for line in lines if line.strip()]
+        except ValueError as exc:
+            raise ParseError('NDJSON parse error - %s' % str(exc))
@@ -0,0 +1,43 @@
+from rest_framework.renderers import JSONRenderer, zero_as_none
+from rest_framework.utils import encoders
+
+from common.helper_functions import get_media_type_params
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer encoding with orjson, producing the same output as JSONRenderer in compact form.
+    Falls back to JSONRenderer if orjson is not installed, or if indented output is requested
+    """
+
+    def get_indent(self, accepted_media_type, renderer_context):
+        if accepted_media_type:
+            # Same as JSONRenderer, which fails on parameters that are not ASCII
+            try:
+                return zero_as_none(max(min(int(get_media_type_params(accepted_media_type)['indent']), 8), 0))
+            except (KeyError, ValueError, TypeError):
+                pass
+
+        return renderer_context.get('indent', None)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return bytes()
+
+        # Types orjson does not support, and datetimes to keep their format, are encoded as DRF does
+        ret = orjson.dumps(data, default=encoders.JSONEncoder().default,
+                           option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+
+        # Escape line and paragraph separators as JSONRenderer does, they are not valid in javascript strings
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+        return ret
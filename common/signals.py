@@ -0,0 +1,54 @@
+import time
+
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from common.helper_functions import clear_message_catalog
+from common.models import Message
+from django_api_base.settings import DB_HEALTH_CHECK_INTERVAL
+
+
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+def message_changed(sender, **kwargs):
+    """
+    Drop the message catalog of this process whenever a message is modified
+    """
+    clear_message_catalog()
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    """
+    Count new database connections as checked, a connection reopened after being closed is checked again only after
+    DB_HEALTH_CHECK_INTERVAL seconds
+    """
+    connection.health_checked_on = time.monotonic()
+
+
+@receiver(request_started)
+def check_database_connections(sender, **kwargs):
+    """
+    Close persistent database connections that became unusable, e.g. after a database restart or an idle timeout
+    on a pooler, so that requests do not fail on a stale connection. Each connection is checked when first reused,
+    then at most once per DB_HEALTH_CHECK_INTERVAL seconds
+    """
+    now = time.monotonic()
+
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+
+        # Connections opened before signal handlers were registered were never checked
+        checked_on = getattr(connection, 'health_checked_on', None)
+
+        if checked_on is not None and now - checked_on < DB_HEALTH_CHECK_INTERVAL:
+            continue
+
+        connection.health_checked_on = now
+
+        if not connection.is_usable():
+            connection.close()
@@ -1,6 +1,31 @@
-from django.test import TestCase, Client
+import datetime
+import decimal
+import gzip
+import io
+import json
+import time
+import uuid
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.test import TestCase, Client, RequestFactory, override_settings
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
 from faker import Factory
 
+from authentication.constants import Messages as AuthenticationMessages
+from common.constants import Messages, MessageTypes
+from common.exceptions import process_error_list
+from common.middleware import CompressionMiddleware
+from common.parsers import FastJSONParser
+from common.renderers import FastJSONRenderer
+from common.signals import check_database_connections
+from common.helper_functions import get_message_object, get_message_header
+from common.models import Message
+
 
 class BaseTests(TestCase):
     """
@@ -11,6 +36,9 @@ class BaseTests(TestCase):
         self.client = Client()
         self.faker = Factory.create()
 
+        # Cached data, e.g. revoked tokens, should not leak between tests
+        cache.clear()
+
     def _get_token(self, username, password):
         """
         Helper method to get token for a user
@@ -40,3 +68,410 @@ class BaseTests(TestCase):
         })
         self.assertEqual(response.status_code, 201)
         return response.json()['id'], username, password
+
+
+class MessageCatalogTests(BaseTests):
+    """
+    Tests for message catalog
+    """
+
+    def test_get_message_object_from_catalog(self):
+        """
+        Message objects should be served from the catalog without querying the database
+        """
+
+        get_message_object(Messages.UNHANDLED_ERROR)
+
+        with self.assertNumQueries(0):
+            message_data = get_message_object(Messages.REQUEST_PARAMETER_MISSING)
+            unknown_message_data = get_message_object('unknown_key')
+
+        self.assertEqual(message_data['key'], Messages.REQUEST_PARAMETER_MISSING)
+        self.assertEqual(unknown_message_data['key'], 'unknown_key')
+
+    def test_catalog_invalidated_on_message_update(self):
+        """
+        Modifications on a message should be reflected without a restart
+        """
+
+        get_message_object(Messages.UNHANDLED_ERROR)
+
+        message = Message.objects.get(key=Messages.UNHANDLED_ERROR)
+        message.body = self.faker.sentence()
+        message.save()
+
+        self.assertEqual(get_message_object(Messages.UNHANDLED_ERROR)['body'], message.body)
+
+    def test_get_message_header_from_catalog(self):
+        """
+        Messages headers should be built once with the catalog, and reflect modifications on messages
+        """
+
+        header = get_message_header(Messages.UNHANDLED_ERROR)
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_message_header(Messages.UNHANDLED_ERROR), header)
+            unknown_header = get_message_header('unknown_key')
+
+        self.assertEqual(json.loads(header), [get_message_object(Messages.UNHANDLED_ERROR)])
+        self.assertEqual(json.loads(unknown_header)[0]['key'], 'unknown_key')
+
+        message = Message.objects.get(key=Messages.UNHANDLED_ERROR)
+        message.body = self.faker.sentence()
+        message.save()
+
+        self.assertEqual(json.loads(get_message_header(Messages.UNHANDLED_ERROR))[0]['body'], message.body)
+
+
+class ProcessErrorListTests(BaseTests):
+    """
+    Tests for flattening validation errors into messages
+    """
+
+    class ItemSerializer(serializers.Serializer):
+        name = serializers.CharField(max_length=3)
+
+    def _get_errors(self, data):
+        serializer = self.ItemSerializer(data=data, many=True)
+        self.assertFalse(serializer.is_valid())
+        return serializer.errors
+
+    def test_nested_errors(self):
+        """
+        Errors of all rows and fields should be returned in order, labelled with their path
+        """
+
+        message_data = get_message_object(Messages.REQUEST_PARAMETER_INVALID)
+        errors = {
+            'code': ['Invalid code.', 'Code too long.'],
+            'items': [{}, {'name': ['Too long.'], 'non_field_errors': [message_data]}],
+            'non_field_errors': ['Invalid order.']
+        }
+
+        messages = []
+        process_error_list(errors, messages)
+
+        self.assertEqual([message['body'] for message in messages], [
+            'Code: Invalid code.',
+            'Code: Code too long.',
+            'Items 2 Name: Too long.',
+            'Items 2: ' + message_data['body'],
+            'Invalid order.'
+        ])
+        self.assertEqual(messages[3]['key'], Messages.REQUEST_PARAMETER_INVALID)
+        self.assertEqual(messages[0], {'key': None, 'type': MessageTypes.ERROR, 'body': 'Code: Invalid code.'})
+
+    def test_list_and_dict_field_errors(self):
+        """
+        Errors of list and dict field items should be labelled with their index or key
+        """
+
+        class TaggedSerializer(serializers.Serializer):
+            tags = serializers.ListField(child=serializers.IntegerField())
+            scores = serializers.DictField(child=serializers.IntegerField())
+
+        serializer = TaggedSerializer(data={'tags': [1, 'z', 3], 'scores': {'math': 'z'}})
+        self.assertFalse(serializer.is_valid())
+
+        messages = []
+        process_error_list(serializer.errors, messages)
+        self.assertEqual([message['body'].split(':')[0] for message in messages], ['Tags 2', 'Scores Math'])
+
+    def test_list_serializer_errors(self):
+        """
+        Errors raised from a list serializer should be labelled with row numbers, and limited if requested
+        """
+
+        errors = self._get_errors([{'name': 'a'}, {'name': 'abcd'}, {}])
+
+        messages = []
+        process_error_list(errors, messages)
+        self.assertEqual([message['body'].split(':')[0] for message in messages], ['Row 2 Name', 'Row 3 Name'])
+
+        messages = []
+        process_error_list(errors, messages, limit=1)
+        self.assertEqual(len(messages), 1)
+
+    @mock.patch('common.helper_functions.VALIDATION_MESSAGES_HEADER_LIMIT', 1)
+    def test_messages_spill_into_body(self):
+        """
+        If there are more messages than fit into header, all of them should be returned in response body
+        """
+
+        response = self.client.post('/users/', data={
+            'username': self.faker.email() + '!',
+            'email': self.faker.name()
+        })
+        self.assertEqual(response.status_code, 400)
+
+        messages = response.json()['messages']
+        self.assertEqual([message['body'].split(':')[0] for message in messages], ['Email', 'Username'])
+        self.assertEqual(json.loads(response['Messages']), messages[:1])
+
+
+class MessagesInBodyTests(BaseTests):
+    """
+    Tests for sending messages in response body
+    """
+
+    def test_messages_in_body_requested(self):
+        """
+        Messages should be sent in response body if requested with Accept header
+        """
+
+        response = self.client.post('/users/', data={
+            'username': self.faker.email() + '!',
+            'email': self.faker.name()
+        }, HTTP_ACCEPT='application/json; messages=body')
+        self.assertEqual(response.status_code, 400)
+
+        self.assertEqual([message['body'].split(':')[0] for message in response.json()['messages']],
+                         ['Email', 'Username'])
+        self.assertEqual(response['Messages-Count'], '2')
+        self.assertFalse(response.has_header('Messages'))
+        self.assertFalse(response.has_header('Messages-Key'))
+
+    def test_accept_parameters_not_ascii(self):
+        """
+        Accept header parameters that are not ASCII should be ignored, and should not fail the request
+        """
+
+        for accept in ('application/json; x="\u00e9"', 'application/json; messages="b\u00f6dy"'):
+            response = self.client.get('/me/', HTTP_AUTHORIZATION='Bearer invalid', HTTP_ACCEPT=accept)
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(json.loads(response['Messages']),
+                             [get_message_object(AuthenticationMessages.TOKEN__INVALID)])
+
+    @mock.patch('common.helper_functions.MESSAGES_IN_BODY', True)
+    def test_messages_in_body_by_default(self):
+        """
+        Messages should be sent in response body if set so, unless Messages header is requested
+        """
+
+        response = self.client.get('/me/', HTTP_AUTHORIZATION='Bearer invalid')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['messages'], [get_message_object(AuthenticationMessages.TOKEN__INVALID)])
+        self.assertEqual(response['Messages-Count'], '1')
+        self.assertEqual(response['Messages-Key'], AuthenticationMessages.TOKEN__INVALID)
+
+        response = self.client.get('/me/', HTTP_AUTHORIZATION='Bearer invalid',
+                                   HTTP_ACCEPT='application/json; messages=header')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(json.loads(response['Messages']),
+                         [get_message_object(AuthenticationMessages.TOKEN__INVALID)])
+
+
+class JSONRendererTests(BaseTests):
+    """
+    Tests for JSON renderer and parser
+    """
+
+    def test_render_same_as_json_renderer(self):
+        """
+        Rendered content should be the same as DRF JSON renderer's
+        """
+
+        data = {
+            'id': 1,
+            'name': self.faker.name() + ' \u00e7\u2028',
+            'created_on': datetime.datetime(2019, 3, 1, 10, 30, 15, 123456),
+            'date': datetime.date(2019, 3, 1),
+            'amount': decimal.Decimal('10.25'),
+            'uuid': uuid.uuid4(),
+            'items': [{'key': None, 'value': 1.5}, True]
+        }
+
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_parse(self):
+        """
+        Parsed data should be the same as the rendered data, and invalid content should raise a parse error
+        """
+
+        data = {'name': self.faker.name(), 'items': [1, 2.5, None]}
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(json.dumps(data).encode('utf-8'))), data)
+
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"name": '))
+
+    def test_render_with_indent(self):
+        """
+        Indented content should be rendered if requested in Accept header, and invalid parameters should be ignored
+        """
+
+        data = {'id': 1, 'items': [1, 2]}
+
+        for accepted_media_type in ('application/json; indent=4', 'application/json; indent=20'):
+            self.assertEqual(FastJSONRenderer().render(data, accepted_media_type),
+                             JSONRenderer().render(data, accepted_media_type))
+
+        for accepted_media_type in ('application/json; indent=x', 'application/json; x="\u00e9"',
+                                    'application/json; indent="\u0664"'):
+            self.assertEqual(FastJSONRenderer().render(data, accepted_media_type), JSONRenderer().render(data))
+
+
+class CompressionMiddlewareTests(BaseTests):
+    """
+    Tests for response compression
+    """
+
+    def _get_response(self, content, accept_encoding):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: HttpResponse(content))(request)
+
+    @mock.patch('common.middleware.brotli', None)
+    def test_gzip(self):
+        """
+        Responses above minimum size should be compressed with gzip if accepted, small responses should not
+        """
+
+        content = json.dumps([{'username': self.faker.email()} for _ in range(100)]).encode('utf-8')
+
+        response = self._get_response(content, 'gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), content)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+        response = self._get_response(content, 'identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, content)
+
+        response = self._get_response(content[:100], 'gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_brotli(self):
+        """
+        Responses should be compressed with brotli if installed and accepted
+        """
+
+        try:
+            import brotli
+        except ImportError:
+            self.skipTest('brotli is not installed')
+
+        content = json.dumps([{'username': self.faker.email()} for _ in range(100)]).encode('utf-8')
+
+        response = self._get_response(content, 'gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), content)
+
+
+@override_settings(MIDDLEWARE=[
+    'django.middleware.common.CommonMiddleware',
+    'common.middleware.AdminMiddleware'
+])
+class AdminMiddlewareTests(BaseTests):
+    """
+    Tests for applying admin middleware to admin requests only
+    """
+
+    def test_admin_middleware_applied_to_admin(self):
+        """
+        Admin site should work with admin middleware applied
+        """
+
+        client = Client(enforce_csrf_checks=True)
+
+        response = client.get('/admin/login/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('X-Frame-Options'))
+        self.assertIn('csrftoken', response.cookies)
+
+        # Login without CSRF token should be rejected
+        response = client.post('/admin/login/', data={'username': self.faker.email(), 'password': 'password'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_admin_middleware_skipped_for_api(self):
+        """
+        API requests should not go through admin middleware
+        """
+
+        user_id, username, password = self._create_user()
+
+        client = Client(enforce_csrf_checks=True)
+        response = client.post('/login/', data={'username': username, 'password': password})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Frame-Options'))
+        self.assertNotIn('sessionid', response.cookies)
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+
+
+class DatabaseHealthCheckTests(BaseTests):
+    """
+    Tests for health checks of persistent database connections
+    """
+
+    def _check_connection(self, checked_before, usable=True):
+        """
+        Helper method to run health checks on an open connection, checked the given number of seconds before, or
+        never checked if None
+        """
+        database_connection = mock.Mock(connection=object(), in_atomic_block=False)
+        database_connection.is_usable.return_value = usable
+
+        if checked_before is None:
+            del database_connection.health_checked_on
+        else:
+            database_connection.health_checked_on = time.monotonic() - checked_before
+
+        with mock.patch('common.signals.connections') as connections_mock:
+            connections_mock.all.return_value = [database_connection]
+            check_database_connections(sender=None)
+
+        return database_connection
+
+    @mock.patch('common.signals.DB_HEALTH_CHECK_INTERVAL', 30)
+    def test_unusable_connection_closed(self):
+        """
+        Connections checked before the health check interval should be checked again, and closed if unusable
+        """
+
+        database_connection = self._check_connection(31, usable=False)
+        database_connection.is_usable.assert_called_once_with()
+        database_connection.close.assert_called_once_with()
+
+        database_connection = self._check_connection(31)
+        database_connection.is_usable.assert_called_once_with()
+        database_connection.close.assert_not_called()
+        self.assertLess(time.monotonic() - database_connection.health_checked_on, 1)
+
+    @mock.patch('common.signals.DB_HEALTH_CHECK_INTERVAL', 30)
+    def test_recently_checked_connection_skipped(self):
+        """
+        Connections checked within the health check interval should not be checked again
+        """
+
+        database_connection = self._check_connection(1, usable=False)
+        database_connection.is_usable.assert_not_called()
+        database_connection.close.assert_not_called()
+
+    @mock.patch('common.signals.DB_HEALTH_CHECK_INTERVAL', 30)
+    def test_never_checked_connection_checked(self):
+        """
+        Connections never checked before should be checked the first time they are reused
+        """
+
+        database_connection = self._check_connection(None, usable=False)
+        database_connection.is_usable.assert_called_once_with()
+        database_connection.close.assert_called_once_with()
+
+    @mock.patch('common.signals.DB_HEALTH_CHECK_INTERVAL', 30)
+    def test_new_connection_skipped(self):
+        """
+        Connections opened within the health check interval should not be checked, even if the connection they
+        replaced was checked long before
+        """
+
+        database_connection = mock.Mock(connection=object(), in_atomic_block=False,
+                                        health_checked_on=time.monotonic() - 60)
+        database_connection.is_usable.return_value = False
+
+        connection_created.send(sender=None, connection=database_connection)
+
+        with mock.patch('common.signals.connections') as connections_mock:
+            connections_mock.all.return_value = [database_connection]
+            check_database_connections(sender=None)
+
+        database_connection.is_usable.assert_not_called()
+        database_connection.close.assert_not_called()
@@ -37,7 +37,10 @@ CORS_ALLOW_HEADERS = (
 )
 
 CORS_EXPOSE_HEADERS = [
-    'x-authtoken'
+    'x-authtoken',
+    'messages',
+    'messages-count',
+    'messages-key'
 ]
 
 ALLOWED_HOSTS = [
@@ -59,17 +62,41 @@ INSTALLED_APPS = [
     'authentication',
 ]
 
-MIDDLEWARE = [
-    'django.middleware.security.SecurityMiddleware',
-    'corsheaders.middleware.CorsMiddleware',
+# API only mode. API authenticates with tokens, so middleware used by admin site only
+# (ADMIN_MIDDLEWARE) is applied to requests under ADMIN_URL_PREFIX and skipped for API requests
+API_ONLY = os.environ.get('apionly', '') == 'true'
+
+ADMIN_URL_PREFIX = '/admin/'
+
+ADMIN_MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+if API_ONLY:
+    MIDDLEWARE = [
+        'common.middleware.CompressionMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'corsheaders.middleware.CorsMiddleware',
+        'django.middleware.common.CommonMiddleware',
+        'common.middleware.AdminMiddleware',
+    ]
+else:
+    MIDDLEWARE = [
+        'common.middleware.CompressionMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'corsheaders.middleware.CorsMiddleware',
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.common.CommonMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    ]
+
 ROOT_URLCONF = 'django_api_base.urls'
 
 TEMPLATES = [
@@ -101,7 +128,25 @@ DATABASES = {
         'USER': os.environ.get('dbuser'),
         'PASSWORD': os.environ.get('dbpass'),
         'HOST': os.environ.get('dbhost'),
-        'PORT': os.environ.get('dbport')
+        'PORT': os.environ.get('dbport'),
+        # Keep connections open between requests, for the given number of seconds
+        'CONN_MAX_AGE': int(os.environ.get('dbconnmaxage', 60)),
+        # Server side cursors can not be used behind a pooler in transaction pooling mode
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('dbpooler', '') == 'true'
+    }
+}
+
+# Seconds after which a persistent connection is checked before being reused for a request. Connections found
+# unusable are closed, and reopened when needed
+DB_HEALTH_CHECK_INTERVAL = int(os.environ.get('dbhealthcheckinterval', 30))
+
+
+# Cache
+# Process local by default. Use a shared backend, e.g. memcached or redis, when running multiple processes
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
@@ -124,6 +169,28 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# PBKDF2 hashes are computed on a bounded thread pool, see common.hashers
+
+PASSWORD_HASHERS = [
+    'common.hashers.PooledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+# Number of threads hashing passwords concurrently, per process. Set to 0 to hash on the request thread.
+# gunicorn.conf.py sizes it so that all workers together use as many threads as there are CPUs
+PASSWORD_HASHING_WORKERS = int(os.environ.get('passwordhashingworkers', os.cpu_count() or 1))
+# Number of hashes that may wait for a free thread, per process. Requests beyond it get 503 responses, which only
+# happens with threaded workers (gunicornthreads > 1). Sync workers serve one request at a time, and never fill it
+PASSWORD_HASHING_QUEUE_SIZE = int(os.environ.get('passwordhashingqueuesize', 16))
+# Seconds to wait for a place in the queue, before responding with 503
+PASSWORD_HASHING_QUEUE_TIMEOUT = 2
+# Seconds sent in Retry-After header of 503 responses
+PASSWORD_HASHING_RETRY_AFTER = 5
+
+
 # Internationalization
 
 LANGUAGE_CODE = 'en-us'
@@ -145,6 +212,19 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 # Authentication
 JWT_SECRET = "@@YbAf.+N#yHi^RU"
+JWT_VALIDITY_LIMIT = 1440  # Minutes
+
+# Maximum number of verified tokens kept in the process local token cache, disabled by default. Enable only with a
+# shared JWT_TOKEN_REVOCATION_CACHE, otherwise revoked tokens are accepted by other processes until their entries expire
+JWT_TOKEN_CACHE_SIZE = int(os.environ.get('jwttokencachesize', 0))
+# Seconds a verified token is kept in the cache
+JWT_TOKEN_CACHE_TIMEOUT = 60
+# Cache alias revoked tokens and users are marked in, checked on each token cache hit. Must be shared by all
+# processes, e.g. memcached or redis, for logouts, user deletions and role changes to apply to all of them
+JWT_TOKEN_REVOCATION_CACHE = 'default'
+# Authorize with the role claims of tokens instead of the roles in the database. Changing roles of a user
+# invalidates tokens issued before
+JWT_TRUST_ROLE_CLAIMS = False
 
 
 # Date formats
@@ -152,10 +232,63 @@ DEFAULT_DATE_FORMAT = '%Y-%m-%d'
 DEFAULT_TIME_FORMAT = '%H:%M:%S'
 DEFAULT_DATE_TIME_FORMAT = DEFAULT_DATE_FORMAT + ' ' + DEFAULT_TIME_FORMAT
 
+# Messages
+# Seconds after which the process local message catalog is reloaded. Modifications are applied immediately
+# on the process they are made through signals, other processes pick them up once their catalog expires
+MESSAGE_CATALOG_TIMEOUT = 300
+# Maximum number of messages returned for a validation error
+VALIDATION_MESSAGES_LIMIT = 1000
+# Maximum number of messages sent in Messages header. If there are more, all of them are sent in response body
+VALIDATION_MESSAGES_HEADER_LIMIT = 10
+# Send messages in response body instead of Messages header by default. Clients can choose per request with
+# "messages" parameter of Accept header, e.g. "application/json; messages=body" or "application/json; messages=header"
+MESSAGES_IN_BODY = False
+
+# Pagination
+# Strategy used to compute Pagination-Count header, one of PaginationCountStrategies values in common.constants.
+# Can be overridden per view with "pagination_count_strategy" attribute
+PAGINATION_COUNT_STRATEGY = 'exact'
+# Seconds a count is cached with "cached" strategy
+PAGINATION_COUNT_CACHE_TIMEOUT = 30
+# Minimum number of estimated rows for a planner estimate to be used with "estimate" strategy.
+# Estimates of smaller tables are not reliable and counting them is cheap
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = 10000
+
+# Maximum number of users returned by typeahead searches
+TYPEAHEAD_RESULT_LIMIT = 20
+# Cache alias and seconds typeahead results are cached for. Results are invalidated when users are modified, in the
+# cache of the alias only. With a process local cache, other processes serve stale results for up to the timeout
+TYPEAHEAD_CACHE = 'default'
+TYPEAHEAD_CACHE_TIMEOUT = 60
+
+# Maximum number of users that can be created with a single bulk import request. Each row costs a password hash,
+# about 70 ms of CPU, on up to half of the hashing workers, or on the request thread with a single hashing worker.
+# Imports must complete within the gunicorn worker timeout (gunicorn.conf.py, 30 seconds), 200 rows take about
+# 14 seconds on a single core
+BULK_USER_IMPORT_LIMIT = 200
+# Number of rows inserted per query by bulk imports
+BULK_USER_IMPORT_BATCH_SIZE = 500
+
+# Responses smaller than this number of bytes are not compressed
+COMPRESSION_MIN_SIZE = 1024
+# Brotli quality, from 0 to 11. Higher qualities compress slightly better at a much higher CPU cost
+COMPRESSION_BROTLI_QUALITY = 4
+
 # DRF settings
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'common.paginators.HeaderLimitOffsetPagination',
 
+    'DEFAULT_RENDERER_CLASSES': [
+        'common.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer'
+    ],
+
+    'DEFAULT_PARSER_CLASSES': [
+        'common.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser'
+    ],
+
     'EXCEPTION_HANDLER': 'common.exceptions.base_exception_handler',
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -0,0 +1,91 @@
+"""
+Gunicorn configuration for django_api_base project.
+
+Worker and thread counts can be set through environment variables, and default to values derived from the
+number of CPUs. The application is loaded before workers are forked, so that workers share imported code.
+"""
+
+import multiprocessing
+import os
+import time
+
+bind = os.environ.get('gunicornbind', 'unix:/usr/src/app/api.sock')
+
+# Workers and threads. With the password hashing pool enabled (see common.hashers), workers are threaded so that
+# requests waiting on password hashes do not hold up the whole process, and there is a worker per CPU
+cpu_count = multiprocessing.cpu_count()
+password_hashing = os.environ.get('passwordhashingworkers') != '0'
+
+if password_hashing:
+    workers = int(os.environ.get('gunicornworkers', cpu_count))
+    threads = int(os.environ.get('gunicornthreads', 8))
+else:
+    workers = int(os.environ.get('gunicornworkers', cpu_count * 2 + 1))
+    threads = int(os.environ.get('gunicornthreads', 1))
+
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+if password_hashing:
+    # Hashing pools of all workers together hash as many passwords at once as there are CPUs, and at most half of
+    # the threads of a worker wait on password hashes. Requests beyond that get 503 responses. Read by the settings,
+    # loaded after this file
+    os.environ.setdefault('passwordhashingworkers', str(max(cpu_count // workers, 1)))
+    os.environ.setdefault('passwordhashingqueuesize',
+                          str(max(threads // 2 - int(os.environ['passwordhashingworkers']), 0)))
+
+# Load application in the master process, forked workers share it through copy-on-write
+preload_app = True
+
+# Connections
+backlog = int(os.environ.get('gunicornbacklog', 2048))
+keepalive = 5
+timeout = 30
+graceful_timeout = 30
+
+# Restart workers periodically, with jitter so that they do not restart at the same time
+max_requests = int(os.environ.get('gunicornmaxrequests', 1000))
+max_requests_jitter = max_requests // 10
+
+
+def pre_fork(server, worker):
+    # Database connections opened in the master, e.g. while loading the application, must not be shared with workers.
+    # Close them before forking, closing them in a worker would terminate the session of the master
+    from django.db import connections
+    connections.close_all()
+
+
+def post_fork(server, worker):
+    # Drop any connection still inherited from the master without closing it. References are kept on the worker, so
+    # that the connections are not finalized, which would also terminate them on the server
+    from django.db import connections
+    worker.inherited_connections = []
+
+    for connection in connections.all():
+        if connection.connection is not None:
+            worker.inherited_connections.append(connection.connection)
+            connection.connection = None
+
+    worker.request_count = 0
+    worker.request_time = 0.0
+    worker.max_request_time = 0.0
+
+
+def pre_request(worker, req):
+    req.start_time = time.monotonic()
+
+
+def post_request(worker, req, environ, resp):
+    request_time = time.monotonic() - req.start_time
+
+    worker.request_count += 1
+    worker.request_time += request_time
+    worker.max_request_time = max(worker.max_request_time, request_time)
+
+    worker.log.debug('%s %s %s %.1fms', req.method, req.path, resp.status, request_time * 1000)
+
+
+def worker_exit(server, worker):
+    if getattr(worker, 'request_count', 0):
+        worker.log.info('Worker %s served %d requests, average %.1fms, max %.1fms', worker.pid,
+                        worker.request_count, worker.request_time / worker.request_count * 1000,
+                        worker.max_request_time * 1000)
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class ProfilesConfig(AppConfig):
     name = 'profiles'
+
+    def ready(self):
+        # Register signal handlers and system checks
+        import profiles.signals  # noqa: F401
+        import profiles.checks  # noqa: F401
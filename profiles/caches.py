@@ -0,0 +1,94 @@
+import hashlib
+import time
+
+from django.core.cache import caches
+
+from django_api_base.settings import TYPEAHEAD_CACHE, TYPEAHEAD_CACHE_TIMEOUT
+
+TYPEAHEAD_VERSION_KEY = 'typeahead:version'
+
+# Typeahead queries shorter than this are not filtered, so shorter prefixes are never cached
+TYPEAHEAD_MIN_QUERY_LENGTH = 3
+
+# User fields typeahead queries are matched against
+TYPEAHEAD_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def _get_typeahead_version(cache):
+    """
+    :return: Current version of typeahead results, part of every cache key
+    """
+    version = cache.get(TYPEAHEAD_VERSION_KEY)
+
+    if version is None:
+        # Start from current time, so that results cached before the version key was evicted are not reused
+        cache.add(TYPEAHEAD_VERSION_KEY, int(time.time() * 1000))
+        version = cache.get(TYPEAHEAD_VERSION_KEY)
+
+    return version
+
+
+def _get_typeahead_key(version, query, rank):
+    return 'typeahead:{}:{}:{}'.format(version, int(rank), hashlib.md5(query.encode('utf-8')).hexdigest())
+
+
+def _user_matches(user_data, query):
+    """
+    :return: True if serialized user matches the query the same way icontains lookups do
+    """
+    return any(query in (user_data[field] or '').lower() for field in TYPEAHEAD_FIELDS)
+
+
+def get_typeahead_results(query, rank, load_results, result_limit):
+    """
+    Get typeahead results from cache. Results of a query can be derived from the cached results of any of its
+    prefixes, as long as the results of the prefix were not limited
+    :param query: Normalized search query
+    :param rank: Whether the results are ranked by similarity
+    :param load_results: Callable loading serialized results from database, if not found in cache
+    :param result_limit: Maximum number of results returned by load_results
+    :return: List of serialized users matching the query
+    """
+    cache = caches[TYPEAHEAD_CACHE]
+    version = _get_typeahead_version(cache)
+
+    key = _get_typeahead_key(version, query, rank)
+    prefix_keys = []
+    if not rank:
+        # Ranking depends on the full query, derive only unranked results
+        prefix_keys = [_get_typeahead_key(version, query[:length], rank)
+                       for length in range(len(query) - 1, TYPEAHEAD_MIN_QUERY_LENGTH - 1, -1)]
+
+    cached = cache.get_many([key] + prefix_keys)
+
+    if key in cached:
+        return cached[key]['results']
+
+    for prefix_key in prefix_keys:
+        prefix_results = cached.get(prefix_key)
+
+        if prefix_results and prefix_results['complete']:
+            results = [user_data for user_data in prefix_results['results'] if _user_matches(user_data, query)]
+            break
+    else:
+        results = load_results()
+
+    cache.set(key, {
+        'results': results,
+        'complete': len(results) < result_limit
+    }, TYPEAHEAD_CACHE_TIMEOUT)
+
+    return results
+
+
+def clear_typeahead_cache():
+    """
+    Invalidate all cached typeahead results
+    """
+    cache = caches[TYPEAHEAD_CACHE]
+
+    try:
+        cache.incr(TYPEAHEAD_VERSION_KEY)
+    except ValueError:
+        # No version yet, nothing cached
+        pass
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+from common.helper_functions import is_cache_process_local
+from django_api_base.settings import TYPEAHEAD_CACHE, TYPEAHEAD_CACHE_TIMEOUT
+
+
+@register()
+def check_typeahead_cache(app_configs, **kwargs):
+    """
+    Warn if typeahead results are cached in a process local cache outside development, where user modifications
+    only invalidate results cached by the process making them
+    """
+    if not settings.DEBUG and is_cache_process_local(TYPEAHEAD_CACHE):
+        return [Warning(
+            'TYPEAHEAD_CACHE uses a process local backend.',
+            hint='Use a shared cache backend, e.g. memcached or redis. Otherwise other processes may serve '
+                 'typeahead results for up to {} seconds after users are modified.'.format(TYPEAHEAD_CACHE_TIMEOUT),
+            id='profiles.W001',
+        )]
+
+    return []
@@ -1,4 +1,9 @@
-from profiles.models import UserRole
+from django.db.models import Prefetch
+
+from profiles.models import UserRole, Role
+
+# Role ids by role type, loaded once per process
+_role_ids = {}
 
 
 def user_has_role(user, role_type):
@@ -8,10 +13,30 @@ def user_has_role(user, role_type):
     :return: True if provided user as provided role, False otherwise
     """
 
-    try:
-        UserRole.objects.get(user=user,
-                             role__type=role_type)
-    except UserRole.DoesNotExist:
-        return False
+    # Anonymous users have no roles
+    return role_type in getattr(user, 'role_types', frozenset())
+
+
+def get_user_roles_prefetch():
+    """
+    :return: Prefetch object loading roles of users together with role objects, to be used in user querysets
+    """
+    return Prefetch('roles', queryset=UserRole.objects.select_related('role'))
+
 
-    return True
+def get_role_id(role_type):
+    """
+    :param role_type: Type of the role, one of RoleTypes values
+    :return: Id of the role with provided type. Loaded once per process, as roles are not expected to change
+    """
+    if role_type not in _role_ids:
+        _role_ids[role_type] = Role.objects.values_list('id', flat=True).get(type=role_type)
+
+    return _role_ids[role_type]
+
+
+def clear_role_ids():
+    """
+    Clear role ids loaded by get_role_id, to be loaded again on next use
+    """
+    _role_ids.clear()
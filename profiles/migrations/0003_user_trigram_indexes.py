@@ -0,0 +1,29 @@
+# Generated by Django 2.1.7 on 2026-10-18 14:31
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Trigram indexes on the expressions used by icontains lookups, serving typeahead searches.
+# Built concurrently, so that writes to the user table are not blocked while they are built
+SEARCH_FIELDS = ('username', 'first_name', 'last_name')
+
+
+class Migration(migrations.Migration):
+
+    # Indexes can not be created concurrently inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('profiles', '0002_user_role_version'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+    ] + [
+        migrations.RunSQL(
+            'CREATE INDEX CONCURRENTLY profiles_user_{0}_trgm ON profiles_user '
+            'USING gin (UPPER({0}::text) gin_trgm_ops);'.format(field),
+            'DROP INDEX CONCURRENTLY IF EXISTS profiles_user_{0}_trgm;'.format(field)
+        )
+        for field in SEARCH_FIELDS
+    ]
@@ -1,14 +1,29 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils.functional import cached_property
 
 from profiles.constants import RoleTypes
 
 
 class User(AbstractUser):
     """
-    Custom user model, adding no extra fields to fields defined in Django's AbstractUser
+    Custom user model. Keeps a role version on top of the fields defined in Django's AbstractUser,
+    increased each time roles of the user change
     """
-    pass
+
+    role_version = models.PositiveIntegerField(default=0)
+
+    @cached_property
+    def role_types(self):
+        """
+        Types of the roles assigned to the user. Loaded with a single query once per instance,
+        which lives as long as the request for authenticated users
+        """
+        if 'roles' in getattr(self, '_prefetched_objects_cache', {}):
+            # Roles already prefetched, no need to query again
+            return frozenset(user_role.role.type for user_role in self.roles.all())
+
+        return frozenset(self.roles.values_list('role__type', flat=True))
 
     def __unicode__(self):
         return self.username
@@ -1,9 +1,16 @@
 from django.contrib.auth import authenticate
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import transaction
 from rest_framework import serializers
 
+from common.constants import Messages as CommonMessages
+from common.hashers import make_passwords
 from common.helper_functions import get_message_object
+from django_api_base.settings import BULK_USER_IMPORT_LIMIT, BULK_USER_IMPORT_BATCH_SIZE
+from profiles.caches import clear_typeahead_cache
 from profiles.constants import Messages, RoleTypes
-from profiles.models import User, UserRole, Role
+from profiles.helper_functions import get_role_id
+from profiles.models import User, UserRole
 
 
 class UserRoleSerializer(serializers.ModelSerializer):
@@ -55,48 +62,115 @@ class UserSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        # Pop settings data if provided
-        try:
-            validated_data.pop('settings')
-        except KeyError:
-            pass
+        with transaction.atomic():
+            # Create user with all fields in a single insert
+            user = User.objects.create_user(username=validated_data.get('username'),
+                                            email=validated_data.get('email'),
+                                            password=validated_data.get('password'),
+                                            first_name=validated_data.get('first_name', ''),
+                                            last_name=validated_data.get('last_name', ''))
 
-        # Create user
-        user = User.objects.create_user(username=validated_data.get('username'),
-                                        email=validated_data.get('email'),
-                                        password=validated_data.get('password'))
-
-        # Set additional user fields
-        user.first_name = validated_data.get('first_name')
-        user.last_name = validated_data.get('last_name')
-        user.save()
-
-        # Add end user role
-        UserRole.objects.create(user=user, role=Role.objects.get(type=RoleTypes.END_USER))
+            # Add end user role. Bulk insert skips role change signals, a new user has no tokens to invalidate
+            UserRole.objects.bulk_create([UserRole(user=user, role_id=get_role_id(RoleTypes.END_USER))])
 
         return user
 
     def update(self, instance, validated_data):
-        # Update UserSettings first
-        try:
-            settings_data = validated_data.pop('settings')
-        except KeyError:
-            settings_data = None
+        # Update only the fields that changed, if any
+        update_fields = []
+        for field in ('username', 'first_name', 'last_name', 'email'):
+            if field in validated_data and getattr(instance, field) != validated_data[field]:
+                setattr(instance, field, validated_data[field])
+                update_fields.append(field)
 
-        if settings_data:
-            instance.settings.expected_daily_calories = \
-                settings_data.get('expected_daily_calories', instance.settings.expected_daily_calories)
-            instance.settings.save()
+        if update_fields:
+            instance.save(update_fields=update_fields)
 
-        # Now update user fields
-        instance.username = validated_data.get('username', instance.username)
-        instance.first_name = validated_data.get('first_name', instance.first_name)
-        instance.last_name = validated_data.get('last_name', instance.last_name)
-        instance.email = validated_data.get('email', instance.email)
+        return instance
 
-        instance.save()
 
-        return instance
+class BulkUserListSerializer(serializers.ListSerializer):
+    """
+    List serializer for bulk user creation. Usernames of all rows are checked against existing users in a single
+    query, and users are created with bulk inserts
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            if len(data) > BULK_USER_IMPORT_LIMIT:
+                raise serializers.ValidationError([get_message_object(CommonMessages.REQUEST_PARAMETER_INVALID)])
+
+            # Used by BulkUserSerializer to check uniqueness of usernames
+            usernames = [row.get('username') for row in data if isinstance(row, dict) and row.get('username')]
+            self.existing_usernames = set(User.objects.filter(username__in=usernames)
+                                          .values_list('username', flat=True))
+            self.validated_usernames = set()
+
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        passwords = make_passwords([row.get('password') for row in validated_data])
+
+        users = [User(username=row.get('username'),
+                      email=User.objects.normalize_email(row.get('email')),
+                      first_name=row.get('first_name', ''),
+                      last_name=row.get('last_name', ''),
+                      password=password)
+                 for row, password in zip(validated_data, passwords)]
+
+        with transaction.atomic():
+            users = User.objects.bulk_create(users, batch_size=BULK_USER_IMPORT_BATCH_SIZE)
+
+            if users and users[0].pk is None:
+                # Database does not return ids of inserted rows, load them by username
+                user_ids = dict(User.objects.filter(username__in=[user.username for user in users])
+                                .values_list('username', 'id'))
+                for user in users:
+                    user.pk = user_ids[user.username]
+
+            # Add end user role
+            role_id = get_role_id(RoleTypes.END_USER)
+            UserRole.objects.bulk_create([UserRole(user=user, role_id=role_id) for user in users],
+                                         batch_size=BULK_USER_IMPORT_BATCH_SIZE)
+
+        # Bulk inserts do not send signals
+        clear_typeahead_cache()
+
+        return users
+
+
+class BulkUserSerializer(UserSerializer):
+    """
+    Serializer class for User model, to be used with many=True for bulk user creation
+    """
+
+    class Meta(UserSerializer.Meta):
+        # Uniqueness is checked for all rows at once by BulkUserListSerializer
+        extra_kwargs = {'username': {'validators': [UnicodeUsernameValidator()]}}
+        list_serializer_class = BulkUserListSerializer
+
+    def validate_username(self, value):
+        bulk_serializer = self.parent
+
+        if value in bulk_serializer.existing_usernames or value in bulk_serializer.validated_usernames:
+            raise serializers.ValidationError(User._meta.get_field('username').error_messages['unique'])
+
+        bulk_serializer.validated_usernames.add(value)
+
+        return value
+
+    def validate(self, data):
+        password = data.get('password')
+        password_confirm = data.get('password_confirm')
+
+        # Imported rows may omit password confirmation
+        if not password:
+            raise serializers.ValidationError([get_message_object(Messages.USER__PASSWORD_MISSING)])
+
+        if password_confirm is not None and password != password_confirm:
+            raise serializers.ValidationError([get_message_object(Messages.USER__PASSWORDS_DO_NOT_MATCH)])
+
+        return data
 
 
 class SimpleUserSerializer(serializers.ModelSerializer):
@@ -129,6 +203,8 @@ class PasswordUpdateSerializer(serializers.Serializer):
         if not user:
             raise serializers.ValidationError([get_message_object(Messages.USER__INVALID_PASSWORD)])
 
+        self.context['user'] = user
+
         # Check that password match
         password = data.get('password')
         password_confirm = data.get('password_confirm')
@@ -139,12 +215,11 @@ class PasswordUpdateSerializer(serializers.Serializer):
         return data
 
     def create(self, validated_data):
-        # Update user password
-        user = authenticate(username=validated_data.get('username'),
-                            password=validated_data.get('current_password'))
+        # Update password of the user authenticated in validate
+        user = self.context.get('user')
 
         user.set_password(validated_data.get('password'))
-        user.save()
+        user.save(update_fields=['password'])
 
         return user
 
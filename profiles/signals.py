@@ -0,0 +1,42 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from profiles.caches import clear_typeahead_cache, TYPEAHEAD_FIELDS
+from profiles.helper_functions import clear_role_ids
+from profiles.models import User, UserRole, Role
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+def user_role_changed(sender, instance, **kwargs):
+    """
+    Increase role version of the user, invalidating role claims of the tokens issued before
+    """
+    User.objects.filter(pk=instance.user_id).update(role_version=F('role_version') + 1)
+
+    # Keep the loaded user instance in sync, if any
+    if sender.user.is_cached(instance):
+        instance.user.role_version += 1
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, update_fields=None, **kwargs):
+    """
+    Invalidate cached typeahead results, as they may contain the user
+    """
+    if update_fields is not None and not set(update_fields).intersection(TYPEAHEAD_FIELDS):
+        # Partial update not affecting typeahead results, e.g. last login or password update
+        return
+
+    clear_typeahead_cache()
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def role_changed(sender, **kwargs):
+    """
+    Clear role ids loaded on this process
+    """
+    clear_role_ids()
@@ -1,11 +1,18 @@
 import json
+from unittest import mock
 
-from django.test import Client
-from faker import Factory
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 
 from authentication.models import JwtToken
+from common.constants import PaginationCountStrategies, Messages as CommonMessages
 from common.tests import BaseTests
+from profiles.checks import check_typeahead_cache
 from profiles.constants import Messages, RoleTypes
+from profiles.helper_functions import user_has_role, get_role_id
 from profiles.models import User, Role, UserRole
 
 
@@ -15,8 +22,7 @@ class UserTests(BaseTests):
     """
 
     def setUp(self):
-        self.client = Client()
-        self.faker = Factory.create()
+        super().setUp()
 
         # Set tokens for an END_USER,  USER_MANAGER and ADMINISTRATOR
         end_user = User.objects.create_user(username=self.faker.email(),
@@ -45,6 +51,35 @@ class UserTests(BaseTests):
         })
         self.assertEqual(response.status_code, 201)
 
+    def test_create_query_count(self):
+        """
+        We should create a user with a single write, and without loading the end user role again
+        """
+
+        password = self.faker.password(length=10)
+        data = {
+            'first_name': self.faker.first_name(),
+            'last_name': self.faker.last_name(),
+            'email': self.faker.email(),
+            'username': self.faker.email(),
+            'password': password,
+            'password_confirm': password
+        }
+
+        get_role_id(RoleTypes.END_USER)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/users/', data=data)
+        self.assertEqual(response.status_code, 201)
+
+        queries = [query['sql'] for query in context.captured_queries]
+        self.assertEqual(len([sql for sql in queries if sql.startswith('INSERT INTO "profiles_user"')]), 1)
+        self.assertFalse([sql for sql in queries if sql.startswith('UPDATE "profiles_user"')])
+        self.assertFalse([sql for sql in queries if 'WHERE "profiles_role"."type"' in sql])
+
+        user = User.objects.get(username=data['username'])
+        self.assertEqual((user.first_name, user.last_name), (data['first_name'], data['last_name']))
+        self.assertEqual(user.role_types, frozenset([RoleTypes.END_USER]))
+
     def test_create_with_missing_data(self):
         """
         We should NOT be able to create a user with providing missing data
@@ -186,6 +221,34 @@ class UserTests(BaseTests):
         self.assertEqual(response.json()['first_name'], updated_first_name)
         self.assertEqual(response.json()['last_name'], updated_last_name)
 
+    def test_partial_update_writes_changed_fields(self):
+        """
+        We should write only the changed fields of a user on update, and nothing if no field changed
+        """
+
+        user = User.objects.create_user(username=self.faker.email(), email=self.faker.email(),
+                                        first_name=self.faker.first_name(), password=self.faker.password(length=10))
+        first_name = user.first_name + 'x'
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch('/users/' + str(user.id) + '/', content_type='application/json',
+                                         HTTP_AUTHORIZATION='Bearer ' + self.administrator_token,
+                                         data={'first_name': first_name})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['first_name'], first_name)
+
+        updates = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertTrue(updates[0].startswith('UPDATE "profiles_user" SET "first_name" = '))
+
+        # Same data again, nothing to write
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch('/users/' + str(user.id) + '/', content_type='application/json',
+                                         HTTP_AUTHORIZATION='Bearer ' + self.administrator_token,
+                                         data={'first_name': first_name})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in context.captured_queries if query['sql'].startswith('UPDATE')])
+
     def test_update_without_authorization(self):
         """
         We should NOT be able to update a user while unauthenticated or authenticated with a different end user
@@ -249,6 +312,80 @@ class UserTests(BaseTests):
         self.assertEqual(response.status_code, 200)
         self.assertGreaterEqual(len(response.json()), 1)
 
+    def test_list_query_count(self):
+        """
+        Number of queries to list users should not depend on the number of users
+        """
+
+        def count_list_queries():
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get('/users/',
+                                           HTTP_AUTHORIZATION='Bearer ' + self.administrator_token)
+                self.assertEqual(response.status_code, 200)
+
+            return len(context.captured_queries)
+
+        # Create a few users and list them, so that token is verified
+        for _ in range(2):
+            self._create_user()
+        count_list_queries()
+        query_count = count_list_queries()
+
+        # Now create more users and list again
+        for _ in range(5):
+            self._create_user()
+        self.assertEqual(count_list_queries(), query_count)
+
+    def test_list_with_cursor_pagination(self):
+        """
+        We should be able to list all users page by page with cursor pagination
+        """
+
+        # Create a few users first
+        for _ in range(5):
+            self._create_user()
+
+        user_ids = []
+        url = '/users/?pagination=cursor&limit=2'
+        while url:
+            response = self.client.get(url, HTTP_AUTHORIZATION='Bearer ' + self.administrator_token)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.json()), 2)
+
+            user_ids += [user['id'] for user in response.json()]
+            url = response.get('Pagination-Next')
+
+        self.assertEqual(user_ids, list(User.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_list_with_count_strategies(self):
+        """
+        We should be able to list users page by page, with or without Pagination-Count header
+        """
+
+        # Create a few users first
+        for _ in range(5):
+            self._create_user()
+        user_count = User.objects.count()
+
+        for count_strategy in (PaginationCountStrategies.EXACT, PaginationCountStrategies.ESTIMATE,
+                               PaginationCountStrategies.CACHED, PaginationCountStrategies.NONE):
+            with mock.patch('common.paginators.PAGINATION_COUNT_STRATEGY', count_strategy):
+                user_ids = []
+                url = '/users/?limit=2'
+                while url:
+                    response = self.client.get(url, HTTP_AUTHORIZATION='Bearer ' + self.administrator_token)
+                    self.assertEqual(response.status_code, 200)
+
+                    if count_strategy == PaginationCountStrategies.NONE:
+                        self.assertNotIn('Pagination-Count', response)
+                    else:
+                        self.assertEqual(int(response['Pagination-Count']), user_count)
+
+                    user_ids += [user['id'] for user in response.json()]
+                    url = response.get('Pagination-Next')
+
+                self.assertEqual(len(user_ids), user_count)
+
     def test_list_without_authorization(self):
         """
         We should NOT be able to list users without a USER_MANAGER or ADMINISTRATOR
@@ -347,6 +484,168 @@ class UserTests(BaseTests):
                                       HTTP_AUTHORIZATION='Bearer ' + self.end_user_token)
         self.assertEqual(response.status_code, 403)
 
+    def test_typeahead(self):
+        """
+        We should be able to search users by username, first name or last name as an administrator
+        """
+
+        first_name = 'Typeahead'
+        for _ in range(3):
+            User.objects.create_user(username=self.faker.email(), email=self.faker.email(),
+                                     first_name=first_name, password=self.faker.password(length=10))
+
+        response = self.client.get('/users/typeahead/', {'query': first_name.lower()},
+                                   HTTP_AUTHORIZATION='Bearer ' + self.administrator_token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+        self.assertTrue(all(user['first_name'] == first_name for user in response.json()))
+
+        # Now try to limit the results
+        response = self.client.get('/users/typeahead/', {'query': first_name.lower(), 'limit': 2},
+                                   HTTP_AUTHORIZATION='Bearer ' + self.administrator_token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_typeahead_ranked(self):
+        """
+        We should get typeahead results ranked by similarity to the query. Requires PostgreSQL with pg_trgm
+        """
+
+        if connection.vendor != 'postgresql':
+            self.skipTest('Ranking requires PostgreSQL')
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            if cursor.fetchone() is None:
+                self.skipTest('Ranking requires pg_trgm extension')
+
+        # Created least similar first, so that ranked order differs from id order
+        user_ids = [User.objects.create_user(username=self.faker.email(), email=self.faker.email(),
+                                             first_name=first_name, password=self.faker.password(length=10)).id
+                    for first_name in ('Zqxwvabcdefgh', 'Zqxwvab', 'Zqxwv')]
+
+        response = self.client.get('/users/typeahead/', {'query': 'zqxwv', 'rank': 1},
+                                   HTTP_AUTHORIZATION='Bearer ' + self.administrator_token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user_data['id'] for user_data in response.json()], user_ids[::-1])
+
+    def test_typeahead_from_cache(self):
+        """
+        Typeahead results of a longer query should be derived from cached results of a shorter one,
+        and cached results should be invalidated when users are modified
+        """
+
+        user = User.objects.create_user(username='typeahead_' + self.faker.email(), email=self.faker.email(),
+                                        password=self.faker.password(length=10))
+
+        response = self.client.get('/users/typeahead/', {'query': 'typea'},
+                                   HTTP_AUTHORIZATION='Bearer ' + self.administrator_token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user_data['id'] for user_data in response.json()], [user.id])
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/users/typeahead/', {'query': 'typeahead'},
+                                       HTTP_AUTHORIZATION='Bearer ' + self.administrator_token)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([user_data['id'] for user_data in response.json()], [user.id])
+
+        self.assertFalse([query for query in context.captured_queries if 'LIKE' in query['sql']])
+
+        # Now update the user, it should not match anymore
+        user.username = self.faker.email()
+        user.save()
+
+        response = self.client.get('/users/typeahead/', {'query': 'typeahead'},
+                                   HTTP_AUTHORIZATION='Bearer ' + self.administrator_token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+    def test_typeahead_without_authorization(self):
+        """
+        We should NOT be able to search users as an end user
+        """
+
+        response = self.client.get('/users/typeahead/', {'query': self.faker.name()},
+                                   HTTP_AUTHORIZATION='Bearer ' + self.end_user_token)
+        self.assertEqual(response.status_code, 403)
+
+    def test_bulk_create(self):
+        """
+        We should be able to create users in bulk with a JSON array or NDJSON payload as an administrator
+        """
+
+        rows = [{
+            'first_name': self.faker.first_name(),
+            'last_name': self.faker.last_name(),
+            'email': self.faker.email(),
+            'username': self.faker.user_name() + str(index),
+            'password': self.faker.password(length=10)
+        } for index in range(4)]
+
+        response = self.client.post('/users/bulk/', data=json.dumps(rows[:2]), content_type='application/json',
+                                    HTTP_AUTHORIZATION='Bearer ' + self.administrator_token)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([user['username'] for user in response.json()], [row['username'] for row in rows[:2]])
+
+        response = self.client.post('/users/bulk/', data='\n'.join(json.dumps(row) for row in rows[2:]) + '\n',
+                                    content_type='application/x-ndjson',
+                                    HTTP_AUTHORIZATION='Bearer ' + self.administrator_token)
+        self.assertEqual(response.status_code, 201)
+
+        # Created users should be able to login, and have end user role
+        for row in rows:
+            user = User.objects.get(username=row['username'])
+            self.assertTrue(user.check_password(row['password']))
+            self.assertEqual(user.role_types, frozenset([RoleTypes.END_USER]))
+
+    def test_bulk_create_with_invalid_rows(self):
+        """
+        We should NOT be able to create any users in bulk if a row is invalid, and should get errors of each row
+        """
+
+        existing_username = User.objects.first().username
+        username = self.faker.user_name()
+        rows = [
+            {'username': username, 'email': self.faker.email(), 'password': self.faker.password(length=10)},
+            {'username': username, 'email': self.faker.email(), 'password': self.faker.password(length=10)},
+            {'username': existing_username, 'email': self.faker.email(), 'password': self.faker.password(length=10)},
+            {'username': self.faker.user_name() + '0', 'email': self.faker.email()}
+        ]
+
+        response = self.client.post('/users/bulk/', data=json.dumps(rows), content_type='application/json',
+                                    HTTP_AUTHORIZATION='Bearer ' + self.administrator_token)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(User.objects.filter(username=username).exists())
+
+        messages = json.loads(response['Messages'])
+        self.assertEqual([message['body'].split(':')[0] for message in messages],
+                         ['Row 2 Username', 'Row 3 Username', 'Row 4'])
+        self.assertEqual(messages[2]['key'], Messages.USER__PASSWORD_MISSING)
+
+    @mock.patch('profiles.serializers.BULK_USER_IMPORT_LIMIT', 1)
+    def test_bulk_create_above_limit(self):
+        """
+        We should NOT be able to create more users in bulk than the limit
+        """
+
+        rows = [{'username': self.faker.user_name() + str(index), 'password': self.faker.password(length=10)}
+                for index in range(2)]
+
+        response = self.client.post('/users/bulk/', data=json.dumps(rows), content_type='application/json',
+                                    HTTP_AUTHORIZATION='Bearer ' + self.administrator_token)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(CommonMessages.REQUEST_PARAMETER_INVALID,
+                      [message['key'] for message in json.loads(response['Messages'])])
+
+    def test_bulk_create_without_authorization(self):
+        """
+        We should NOT be able to create users in bulk as an end user
+        """
+
+        response = self.client.post('/users/bulk/', data=json.dumps([]), content_type='application/json',
+                                    HTTP_AUTHORIZATION='Bearer ' + self.end_user_token)
+        self.assertEqual(response.status_code, 403)
+
     def test_password_update(self):
         """
         We should be able to update user password with the user itself, with an administrator or with a user manager
@@ -386,6 +685,37 @@ class UserTests(BaseTests):
         )
         self.assertEqual(response.status_code, 200)
 
+    def test_password_update_authenticates_once(self):
+        """
+        We should authenticate once on password update, and write only the password of the user
+        """
+
+        user_id, username, password = self._create_user()
+        token = self._get_token(username, password)
+
+        updated_password = self.faker.password()
+        with mock.patch('profiles.serializers.authenticate', wraps=authenticate) as authenticate_mock, \
+                CaptureQueriesContext(connection) as context:
+            response = self.client.put(
+                '/users/' + str(user_id) + '/passwords/',
+                content_type='application/json',
+                HTTP_AUTHORIZATION='Bearer ' + token,
+                data={
+                    'current_password': password,
+                    'password': updated_password,
+                    'password_confirm': updated_password
+                }
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(authenticate_mock.call_count, 1)
+
+        updates = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertTrue(updates[0].startswith('UPDATE "profiles_user" SET "password" = '))
+        self.assertNotIn('"last_login"', updates[0])
+
+        self.assertTrue(User.objects.get(pk=user_id).check_password(updated_password))
+
     def test_password_update_with_invalid_data(self):
         """
         We should NOT be able to update user password providing invalid request data
@@ -472,8 +802,7 @@ class UserRoleTests(BaseTests):
     """
 
     def setUp(self):
-        self.client = Client()
-        self.faker = Factory.create()
+        super().setUp()
 
         # Get administrator role object
         self.administrator_role = Role.objects.get(type=RoleTypes.ADMINISTRATOR)
@@ -535,3 +864,50 @@ class UserRoleTests(BaseTests):
             'role': self.administrator_role.id
         }, HTTP_AUTHORIZATION='Bearer ' + token)
         self.assertEqual(response.status_code, 403)
+
+
+class RoleCheckTests(BaseTests):
+    """
+    Tests for user role checks
+    """
+
+    def test_role_types_loaded_once(self):
+        """
+        Roles of a user should be loaded with a single query, regardless of the number of role checks
+        """
+
+        user = User.objects.create_user(username=self.faker.email(),
+                                        email=self.faker.email(), password=self.faker.password(length=10))
+        UserRole.objects.create(user=user, role=Role.objects.get(type=RoleTypes.ADMINISTRATOR))
+
+        with self.assertNumQueries(1):
+            for _ in range(10):
+                self.assertTrue(user_has_role(user, RoleTypes.ADMINISTRATOR))
+                self.assertFalse(user_has_role(user, RoleTypes.END_USER))
+
+    def test_anonymous_user_has_no_roles(self):
+        """
+        Anonymous users should not have any roles
+        """
+
+        self.assertFalse(user_has_role(AnonymousUser(), RoleTypes.END_USER))
+
+
+class TypeaheadCacheCheckTests(BaseTests):
+    """
+    Tests for the system check of the typeahead cache configuration
+    """
+
+    @override_settings(DEBUG=False)
+    def test_typeahead_cache_process_local(self):
+        """
+        We should get a warning when typeahead results are cached in a process local cache outside development
+        """
+
+        local_caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=local_caches):
+            self.assertEqual([warning.id for warning in check_typeahead_cache(None)], ['profiles.W001'])
+
+        shared_caches = {'default': {'BACKEND': 'django.core.cache.backends.memcached.PyLibMCCache'}}
+        with override_settings(CACHES=shared_caches):
+            self.assertFalse(check_typeahead_cache(None))
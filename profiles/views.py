@@ -1,13 +1,20 @@
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Q
+from django.db.models.functions import Greatest
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets
+from rest_framework import viewsets, status
 from rest_framework.decorators import list_route, detail_route
 from rest_framework.response import Response
 
+from common.parsers import FastJSONParser, NDJSONParser
 from common.permissions import SuperUserPermissions, AdministratorPermissions
+from django_api_base.settings import TYPEAHEAD_RESULT_LIMIT
+from profiles.caches import get_typeahead_results, TYPEAHEAD_MIN_QUERY_LENGTH
+from profiles.helper_functions import get_user_roles_prefetch
 from profiles.models import User, UserRole
 from profiles.permissions import UserViewPermissions
 from profiles.serializers import UserSerializer, UserRoleManagementSerializer, SimpleUserSerializer, \
-    PasswordUpdateSerializer
+    PasswordUpdateSerializer, BulkUserSerializer
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -19,6 +26,15 @@ class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = (UserViewPermissions,)
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        if self.action != 'typeahead':
+            # Load roles for UserSerializer in a single query
+            queryset = queryset.prefetch_related(get_user_roles_prefetch())
+
+        return queryset
+
     @detail_route(methods=['put'])
     def passwords(self, request, *args, **kwargs):
         """
@@ -36,19 +52,62 @@ class UserViewSet(viewsets.ModelViewSet):
 
         return Response(self.get_serializer(user).data)
 
+    @list_route(methods=['post'], permission_classes=[AdministratorPermissions],
+                parser_classes=[FastJSONParser, NDJSONParser])
+    def bulk(self, request):
+        """
+        Create users in bulk from a JSON array or NDJSON payload, with end user role.
+        Either all users are created, or none of them with errors of each invalid row
+        """
+        serializer = BulkUserSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        # Serializer data valid. Proceed with create
+        users = serializer.save()
+
+        return Response(SimpleUserSerializer(users, many=True).data, status=status.HTTP_201_CREATED)
+
     @list_route(methods=['get'], permission_classes=[AdministratorPermissions])
     def typeahead(self, request):
         """
-        Return users matching a search query, to be used for typeahead
+        Return users matching a search query on username, first name or last name, to be used for typeahead.
+        Results are limited to TYPEAHEAD_RESULT_LIMIT users, and ranked by similarity if "rank" parameter is set.
+        Results are cached, and derived from cached results of shorter queries where possible
         """
-        users = self.get_queryset()
+        query = (request.query_params.get('query', None) or '').strip().lower()
+        if len(query) < TYPEAHEAD_MIN_QUERY_LENGTH:
+            query = ''
+
+        rank = bool(query) and request.query_params.get('rank', None) in ('1', 'true')
+
+        def load_results():
+            users = self.get_queryset()
+
+            if query:
+                # Served by trigram indexes on each field
+                users = users.filter(Q(username__icontains=query) |
+                                     Q(first_name__icontains=query) |
+                                     Q(last_name__icontains=query))
+
+                if rank:
+                    # Most similar users first
+                    users = users.annotate(similarity=Greatest(TrigramSimilarity('username', query),
+                                                               TrigramSimilarity('first_name', query),
+                                                               TrigramSimilarity('last_name', query)))
+                    users = users.order_by('-similarity', 'id')
+
+            return [dict(user_data) for user_data in
+                    SimpleUserSerializer(users[:TYPEAHEAD_RESULT_LIMIT], many=True).data]
 
-        query = request.query_params.get('query', None)
+        results = get_typeahead_results(query, rank, load_results, TYPEAHEAD_RESULT_LIMIT)
 
-        if query and len(query) > 2:
-            users = users.filter(username__icontains=query)
+        # Limit number of results, clients may request fewer
+        try:
+            limit = min(int(request.query_params['limit']), TYPEAHEAD_RESULT_LIMIT)
+        except (KeyError, ValueError):
+            limit = TYPEAHEAD_RESULT_LIMIT
 
-        return Response(SimpleUserSerializer(users, many=True).data)
+        return Response(results[:max(limit, 0)])
 
 
 class UserRoleViewSet(viewsets.ModelViewSet):